@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_state():
+    """Тесты pytest со своими кэшем и
+    индексом миниатюр."""
+    from core.testing import isolated_state
+
+    with isolated_state():
+        yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    # Миниатюры пишутся в фоне: до удаления
+    # MEDIA_ROOT фикстурами их надо дождаться.
+    yield
+    from posts import thumbnails
+
+    thumbnails.drain()
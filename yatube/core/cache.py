@@ -0,0 +1,273 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_entries_accessed
+    ON cache_entries (accessed);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size (id, entries) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_entries_inserted
+    AFTER INSERT ON cache_entries
+    BEGIN UPDATE cache_size SET entries = entries + 1; END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_deleted
+    AFTER DELETE ON cache_entries
+    BEGIN UPDATE cache_size SET entries = entries - 1; END;
+"""
+
+ALIVE = "(expires IS NULL OR expires > ?)"
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для процессов одного хоста.
+
+    Все воркеры gunicorn, указавшие один ``LOCATION``, видят одни и те же
+    записи, а внешний сервер не нужен. Размер ограничен ``MAX_ENTRIES``:
+    при переполнении сначала удаляются просроченные записи, затем
+    ``1/CULL_FREQUENCY`` давно не читавшихся (LRU). Время чтения
+    обновляется не чаще раза в ``TOUCH_INTERVAL`` секунд, чтобы горячие
+    ключи не превращали каждое чтение в запись.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        options = params.get("OPTIONS", {})
+        self._touch_interval = float(options.get("TOUCH_INTERVAL", 1))
+        self._busy_timeout = float(options.get("BUSY_TIMEOUT", 5))
+        self._local = threading.local()
+
+    def _connection(self):
+        # После fork соединение родителя использовать нельзя.
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path, timeout=self._busy_timeout, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("BEGIN IMMEDIATE")
+        for statement in SCHEMA.split(";\n"):
+            if statement.strip():
+                connection.execute(statement)
+        connection.execute("COMMIT")
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция с блокировкой записи с самого начала."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            exists = connection.execute(
+                f"SELECT 1 FROM cache_entries WHERE key = ? AND {ALIVE}",
+                (key, time.time()),
+            ).fetchone()
+            if exists:
+                return False
+            self._store(connection, key, value, timeout)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        return {
+            keys[key]: value for key, value in self._read(list(keys)).items()
+        }
+
+    def _read(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._connection().execute(
+            "SELECT key, value, accessed FROM cache_entries "
+            f"WHERE key IN ({', '.join('?' * len(keys))}) AND {ALIVE}",
+            (*keys, now),
+        ).fetchall()
+        stale = [
+            key for key, _, accessed in rows
+            if now - accessed >= self._touch_interval
+        ]
+        if stale:
+            with self._write() as connection:
+                connection.execute(
+                    "UPDATE cache_entries SET accessed = ? "
+                    f"WHERE key IN ({', '.join('?' * len(stale))})",
+                    (now, *stale),
+                )
+        return {key: pickle.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            self._store(connection, key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._write() as connection:
+            for key, value in data.items():
+                self._store(
+                    connection, self._key(key, version), value, timeout
+                )
+        return []
+
+    def _store(self, connection, key, value, timeout):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        if expires is not None and expires <= now:
+            connection.execute(
+                "DELETE FROM cache_entries WHERE key = ?", (key,)
+            )
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        connection.execute(
+            "INSERT INTO cache_entries (key, value, expires, accessed) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+            "value = excluded.value, expires = excluded.expires, "
+            "accessed = excluded.accessed",
+            (key, pickled, expires, now),
+        )
+        self.written(key, len(pickled))
+        self._cull(connection, now)
+
+    def _cull(self, connection, now):
+        (entries,) = connection.execute(
+            "SELECT entries FROM cache_size"
+        ).fetchone()
+        if entries <= self._max_entries:
+            return
+        connection.execute(
+            "DELETE FROM cache_entries WHERE expires <= ?", (now,)
+        )
+        (entries,) = connection.execute(
+            "SELECT entries FROM cache_size"
+        ).fetchone()
+        if entries <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            count = entries
+        else:
+            count = max(entries // self._cull_frequency, 1)
+        evicted = [
+            key for (key,) in connection.execute(
+                "SELECT key FROM cache_entries ORDER BY accessed LIMIT ?",
+                (count,),
+            )
+        ]
+        connection.executemany(
+            "DELETE FROM cache_entries WHERE key = ?",
+            [(key,) for key in evicted],
+        )
+        self.evicted(evicted)
+
+    def evicted(self, keys):
+        """Вызывается с полными ключами записей, вытесненных по LRU.
+
+        Ничего не делает; обёртка со статистикой подменяет его, чтобы
+        считать вытеснения.
+        """
+
+    def written(self, key, size):
+        """Вызывается с полным ключом и размером записанного значения.
+
+        Ничего не делает; обёртка со статистикой считает так байты,
+        не сериализуя значение второй раз.
+        """
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            updated = connection.execute(
+                f"UPDATE cache_entries SET expires = ? "
+                f"WHERE key = ? AND {ALIVE}",
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount
+        return updated == 1
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно и для параллельных процессов: чтение и запись
+        выполняются под одной блокировкой записи SQLite."""
+        key = self._key(key, version)
+        with self._write() as connection:
+            row = connection.execute(
+                f"SELECT value FROM cache_entries WHERE key = ? AND {ALIVE}",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                "UPDATE cache_entries SET value = ? WHERE key = ?",
+                (pickled, key),
+            )
+        self.written(key, len(pickled))
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            f"SELECT 1 FROM cache_entries WHERE key = ? AND {ALIVE}",
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            deleted = connection.execute(
+                "DELETE FROM cache_entries WHERE key = ?", (key,)
+            ).rowcount
+        return deleted == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if not keys:
+            return
+        with self._write() as connection:
+            connection.execute(
+                "DELETE FROM cache_entries "
+                f"WHERE key IN ({', '.join('?' * len(keys))})",
+                keys,
+            )
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute("DELETE FROM cache_entries")
@@ -0,0 +1,328 @@
+import os
+import re
+import socket
+import threading
+import time
+from functools import wraps
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+SEPARATOR = re.compile(r"\|\||[.:]")
+FIELDS = (
+    "hits", "misses", "sets", "deletes", "evictions", "bytes",
+    "operations", "seconds", "max_seconds",
+)
+# Служебные ключи статистики пишутся мимо счётчиков.
+STATS_PREFIX = "cache-stats:"
+REGISTRY_KEY = f"{STATS_PREFIX}processes"
+EPOCH_KEY = f"{STATS_PREFIX}epoch"
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+FLUSH_INTERVAL = 10
+MISSING = object()
+
+
+def namespace(key, patterns):
+    """Пространство имён ключа для статистики.
+
+    ``patterns`` — префиксы ключей, самый длинный подходящий побеждает.
+    Префикс со звёздочкой на конце забирает ещё одну часть ключа:
+    ``template.cache.*`` даёт ``template.cache.index_page``. Ключ без
+    подходящего префикса относится к своей первой части до ``.``, ``:``
+    или ``||``.
+    """
+    for pattern in patterns:
+        if pattern.endswith("*"):
+            base = pattern[:-1]
+            if key.startswith(base):
+                return base + SEPARATOR.split(key[len(base):], 1)[0]
+        elif key.startswith(pattern):
+            return pattern
+    return SEPARATOR.split(key, 1)[0]
+
+
+def summarize(stats):
+    """Строки отчёта: счётчики, доля попаданий и задержки в мс."""
+    rows = []
+    for name, counters in sorted(stats.items()):
+        reads = counters["hits"] + counters["misses"]
+        operations = counters["operations"]
+        rows.append({
+            "namespace": name,
+            **{field: counters[field] for field in FIELDS[:6]},
+            "hit_ratio": counters["hits"] / reads if reads else None,
+            "mean_ms": (
+                counters["seconds"] / operations * 1000 if operations else 0
+            ),
+            "max_ms": counters["max_seconds"] * 1000,
+        })
+    return rows
+
+
+def timed(method):
+    """Замеряет вызов и делит время поровну между его ключами."""
+    @wraps(method)
+    def wrapper(self, keys, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(self, keys, *args, **kwargs)
+        finally:
+            self._recorder.timing(keys, time.perf_counter() - start)
+            self._maybe_flush()
+    return wrapper
+
+
+class Recorder:
+    """Счётчики одного кэша в процессе.
+
+    Django создаёт экземпляр бэкенда на каждый поток, а счётчики нужны
+    на процесс, поэтому потоки делят один ``Recorder``.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.epoch = MISSING
+        self.flushed = time.monotonic()
+        self.pid = os.getpid()
+        self.key = f"{STATS_PREFIX}{socket.gethostname()}:{self.pid}"
+
+    def _counters(self, key):
+        return self.counters.setdefault(
+            namespace(str(key), self.patterns), dict.fromkeys(FIELDS, 0)
+        )
+
+    def count(self, key, field, amount=1):
+        with self.lock:
+            self._counters(key)[field] += amount
+
+    def timing(self, keys, seconds):
+        if isinstance(keys, str):
+            keys = [keys]
+        keys = list(keys)
+        if not keys:
+            return
+        share = seconds / len(keys)
+        with self.lock:
+            for key in keys:
+                counters = self._counters(key)
+                counters["operations"] += 1
+                counters["seconds"] += share
+                counters["max_seconds"] = max(counters["max_seconds"], share)
+
+    def snapshot(self, epoch):
+        """Копия счётчиков; со сменой эпохи они начинаются заново."""
+        with self.lock:
+            if self.epoch is not MISSING and epoch != self.epoch:
+                self.counters = {}
+            self.epoch = epoch
+            self.flushed = time.monotonic()
+            return {
+                name: dict(counters)
+                for name, counters in self.counters.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.epoch = MISSING
+
+
+_recorders = {}
+_recorders_lock = threading.Lock()
+
+
+def recorder(name, patterns):
+    """Общий для потоков процесса ``Recorder``; после fork — новый."""
+    with _recorders_lock:
+        found = _recorders.get(name)
+        if found is None or found.pid != os.getpid():
+            found = _recorders[name] = Recorder(patterns)
+        return found
+
+
+class InstrumentedCache(BaseCache):
+    """Обёртка над любым бэкендом кэша со статистикой по пространствам
+    имён ключей.
+
+    Считает попадания, промахи, записи, удаления, время операций,
+    а также вытеснения и записанные байты, если бэкенд сообщает о них,
+    как ``SQLiteCache``. Настраивается через ``OPTIONS``: ``WRAPPED`` —
+    обычная настройка кэша, который оборачивается, ``NAMESPACES`` —
+    префиксы ключей (см. ``namespace``), ``FLUSH_INTERVAL`` — как часто
+    процесс сохраняет свои счётчики в сам кэш, откуда ``stats`` собирает
+    их по всем воркерам.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        wrapped = dict(options["WRAPPED"])
+        backend = wrapped.pop("BACKEND")
+        location = wrapped.pop("LOCATION", "")
+        self._cache = import_string(backend)(location, wrapped)
+        if hasattr(self._cache, "evicted"):
+            self._cache.evicted = self._evicted
+        if hasattr(self._cache, "written"):
+            self._cache.written = self._written_bytes
+        self._recorder = recorder(
+            f"{backend}:{location}",
+            sorted(options.get("NAMESPACES", ()), key=len, reverse=True),
+        )
+        self._flush_interval = float(
+            options.get("FLUSH_INTERVAL", FLUSH_INTERVAL)
+        )
+
+    def __getattr__(self, name):
+        if name == "_cache":
+            raise AttributeError(name)
+        return getattr(self._cache, name)
+
+    def _written(self, key):
+        self._recorder.count(key, "sets")
+
+    def _written_bytes(self, key, size):
+        # Полный ключ бэкенда: «префикс:версия:ключ».
+        key = key.split(":", 2)[-1]
+        if not key.startswith(STATS_PREFIX):
+            self._recorder.count(key, "bytes", size)
+
+    def _evicted(self, keys):
+        for key in keys:
+            self._recorder.count(key.split(":", 2)[-1], "evictions")
+
+    # Сбор по процессам.
+
+    def _maybe_flush(self):
+        elapsed = time.monotonic() - self._recorder.flushed
+        if elapsed >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Сохраняет счётчики процесса в кэш.
+
+        Потерянная при гонке запись в реестр процессов восстанавливается
+        при следующем сохранении.
+        """
+        found = self._cache.get_many([REGISTRY_KEY, EPOCH_KEY])
+        key = self._recorder.key
+        snapshot = self._recorder.snapshot(found.get(EPOCH_KEY))
+        self._cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+        registry = found.get(REGISTRY_KEY) or set()
+        if key not in registry:
+            self._cache.set(REGISTRY_KEY, registry | {key}, None)
+
+    def stats(self):
+        """Счётчики всех процессов, сложенные по пространствам имён.
+
+        Свои счётчики процесс сохраняет перед сбором, чужие отстают не
+        больше чем на ``FLUSH_INTERVAL``.
+        """
+        self.flush()
+        registry = self._cache.get(REGISTRY_KEY) or set()
+        snapshots = self._cache.get_many(registry)
+        if set(snapshots) != registry:
+            # Снимки завершившихся процессов истекли.
+            self._cache.set(REGISTRY_KEY, set(snapshots), None)
+        total = {}
+        for snapshot in snapshots.values():
+            for name, counters in snapshot.items():
+                merged = total.setdefault(name, dict.fromkeys(FIELDS, 0))
+                for field, value in counters.items():
+                    if field == "max_seconds":
+                        merged[field] = max(merged[field], value)
+                    else:
+                        merged[field] += value
+        return total
+
+    def reset_stats(self):
+        """Обнуляет статистику во всех процессах: остальные сбросят
+        свои счётчики, увидев новую эпоху."""
+        registry = self._cache.get(REGISTRY_KEY) or set()
+        self._cache.delete_many([REGISTRY_KEY, *registry])
+        self._cache.set(EPOCH_KEY, time.time_ns(), None)
+        self._recorder.reset()
+
+    # Операции кэша.
+
+    @timed
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._cache.add(key, value, timeout, version)
+        if added:
+            self._written(key)
+        return added
+
+    @timed
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, MISSING, version)
+        self._recorder.count(key, "misses" if value is MISSING else "hits")
+        return default if value is MISSING else value
+
+    @timed
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._cache.set(key, value, timeout, version)
+        self._written(key)
+
+    @timed
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.touch(key, timeout, version)
+
+    @timed
+    def delete(self, key, version=None):
+        self._recorder.count(key, "deletes")
+        return self._cache.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        return self._get_many(keys, version)
+
+    @timed
+    def _get_many(self, keys, version=None):
+        found = self._cache.get_many(keys, version)
+        for key in keys:
+            self._recorder.count(key, "hits" if key in found else "misses")
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set_many(dict(data), timeout, version)
+
+    @timed
+    def _set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self._cache.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in (failed or ()):
+                self._written(key)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._delete_many(keys, version)
+
+    @timed
+    def _delete_many(self, keys, version=None):
+        for key in keys:
+            self._recorder.count(key, "deletes")
+        self._cache.delete_many(keys, version)
+
+    @timed
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version)
+
+    @timed
+    def incr(self, key, delta=1, version=None):
+        value = self._cache.incr(key, delta, version)
+        self._written(key)
+        return value
+
+    @timed
+    def decr(self, key, delta=1, version=None):
+        value = self._cache.decr(key, delta, version)
+        self._written(key)
+        return value
+
+    def clear(self):
+        self._cache.clear()
+
+    def close(self, **kwargs):
+        self._cache.close(**kwargs)
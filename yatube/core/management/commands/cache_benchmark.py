@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+PAGE = "x" * 20000
+
+
+def backends(directory, max_entries):
+    params = {"OPTIONS": {"MAX_ENTRIES": max_entries}}
+    return {
+        "LocMemCache": LocMemCache("benchmark", params),
+        "SQLiteCache": SQLiteCache(
+            os.path.join(directory, "cache.sqlite3"), params
+        ),
+    }
+
+
+def is_hit(cache, ready, result):
+    ready.wait()
+    result.put(cache.get("page") is not None)
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость SQLiteCache и LocMemCache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--operations", type=int, default=5000)
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        operations = options["operations"]
+        with tempfile.TemporaryDirectory() as directory:
+            for name, cache in backends(directory, operations * 2).items():
+                cache.set("counter", 0)
+                timings = {
+                    "set": self.measure(
+                        operations, lambda n: cache.set(f"key{n}", PAGE)
+                    ),
+                    "get": self.measure(
+                        operations, lambda n: cache.get(f"key{n}")
+                    ),
+                    "incr": self.measure(
+                        operations, lambda n: cache.incr("counter")
+                    ),
+                }
+                report = ", ".join(
+                    f"{operation} {rate:,.0f}/с"
+                    for operation, rate in timings.items()
+                )
+                hits = self.shared_hits(cache, options["workers"])
+                self.stdout.write(
+                    f"{name}: {report}; "
+                    f"попаданий в других процессах "
+                    f"{hits}/{options['workers']}"
+                )
+
+    @staticmethod
+    def measure(operations, operation):
+        """Операций в секунду."""
+        start = time.perf_counter()
+        for number in range(operations):
+            operation(number)
+        return operations / (time.perf_counter() - start)
+
+    @staticmethod
+    def shared_hits(cache, workers):
+        """Сколько воркеров видят страницу, закэшированную родителем
+        уже после их запуска (как воркеры gunicorn после fork)."""
+        ready = multiprocessing.Event()
+        result = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=is_hit, args=(cache, ready, result)
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        cache.set("page", PAGE)
+        ready.set()
+        for process in processes:
+            process.join()
+        return sum(result.get() for _ in processes)
@@ -0,0 +1,58 @@
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache_stats import summarize
+
+COLUMNS = (
+    ("namespace", "{:<36}"),
+    ("hits", "{:>9}"),
+    ("misses", "{:>9}"),
+    ("hit_ratio", "{:>7}"),
+    ("sets", "{:>8}"),
+    ("deletes", "{:>8}"),
+    ("evictions", "{:>9}"),
+    ("bytes", "{:>11}"),
+    ("mean_ms", "{:>8}"),
+    ("max_ms", "{:>8}"),
+)
+
+
+class Command(BaseCommand):
+    help = "Показывает статистику кэша по пространствам имён ключей."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--json", action="store_true", help="Вывести JSON."
+        )
+        parser.add_argument(
+            "--reset", action="store_true",
+            help="Обнулить статистику во всех процессах.",
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, "stats"):
+            raise CommandError("Кэш по умолчанию не собирает статистику.")
+        if options["reset"]:
+            cache.reset_stats()
+            self.stdout.write("Статистика обнулена.")
+            return
+        rows = summarize(cache.stats())
+        if options["json"]:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        self.stdout.write(
+            " ".join(fmt.format(name) for name, fmt in COLUMNS)
+        )
+        for row in rows:
+            ratio = row["hit_ratio"]
+            row = {
+                **row,
+                "hit_ratio": "-" if ratio is None else f"{ratio:.0%}",
+                "mean_ms": f"{row['mean_ms']:.2f}",
+                "max_ms": f"{row['max_ms']:.2f}",
+            }
+            self.stdout.write(
+                " ".join(fmt.format(row[name]) for name, fmt in COLUMNS)
+            )
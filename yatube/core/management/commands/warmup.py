@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.warmup import compile_templates, warm_up
+
+
+class Command(BaseCommand):
+    help = "Прогревает шаблоны и URL и показывает время запуска воркера."
+
+    def handle(self, *args, **options):
+        for stage, (count, seconds) in warm_up().items():
+            self.stdout.write(f"{stage}: {count} за {seconds * 1000:.1f} мс")
+        # С кэширующим загрузчиком повторная загрузка почти бесплатна;
+        # без него (DEBUG) шаблоны разбираются заново при каждом запросе.
+        start = time.perf_counter()
+        compile_templates()
+        self.stdout.write(
+            "templates повторно: "
+            f"{(time.perf_counter() - start) * 1000:.1f} мс"
+        )
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.urls import Resolver404, resolve
+
+
+class AnonymousCacheMiddleware:
+    """Отдаёт гостям готовые страницы до сессий, авторизации и CSRF.
+
+    Срабатывает для GET/HEAD без куки сессии и сообщений, если у
+    представления есть ``cached_response`` (его добавляет
+    ``posts.generations.cache_feed``): ключи кэша, поколения и ETag те
+    же, что и у самого представления. Если свежего ответа нет, запрос
+    идёт по обычному пути и заодно наполняет кэш.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = None
+        if self.is_anonymous(request):
+            response = self.cached_response(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    @staticmethod
+    def is_anonymous(request):
+        cookies = (settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name)
+        return request.method in ("GET", "HEAD") and not any(
+            name in request.COOKIES for name in cookies
+        )
+
+    @staticmethod
+    def cached_response(request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        lookup = getattr(match.func, "cached_response", None)
+        if lookup is None:
+            return None
+        return lookup(request, *match.args, **match.kwargs)
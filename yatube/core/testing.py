@@ -0,0 +1,47 @@
+import copy
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def isolated_state():
+    """Кэш и индекс миниатюр в своих файлах во временном каталоге.
+
+    Иначе тесты очищали бы кэш dev-сервера, а параллельные запуски мешали бы
+    друг другу.
+    """
+    directory = tempfile.mkdtemp(prefix="yatube-test-")
+    caches = copy.deepcopy(settings.CACHES)
+    default = caches["default"]
+    # Обёртка со статистикой хранит настройки кэша в WRAPPED.
+    default = default.get("OPTIONS", {}).get("WRAPPED", default)
+    default["LOCATION"] = os.path.join(directory, "cache.sqlite3")
+    try:
+        with override_settings(
+            CACHES=caches,
+            THUMBNAIL_KVSTORE_PATH=os.path.join(
+                directory, "thumbnails.sqlite3"
+            ),
+        ):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """``manage.py test`` со своими кэшем и индексом миниатюр."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._state = isolated_state()
+        self._state.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._state.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
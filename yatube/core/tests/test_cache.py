@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+INCREMENTS = 50
+PROCESSES = 4
+
+
+def make_cache(path, **options):
+    options.setdefault("TOUCH_INTERVAL", 0)
+    return SQLiteCache(path, {"OPTIONS": options})
+
+
+def increment(path):
+    cache = make_cache(path)
+    for _ in range(INCREMENTS):
+        cache.incr("hits")
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache.sqlite3")
+        self.cache = make_cache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """set/get/add/delete/touch работают как у встроенных кэшей"""
+        cache = self.cache
+        self.assertIsNone(cache.get("post"))
+        cache.set("post", {"text": "Текст"})
+        self.assertEqual(cache.get("post"), {"text": "Текст"})
+        self.assertFalse(cache.add("post", "другой"))
+        self.assertTrue(cache.add("group", "Группа"))
+        self.assertEqual(
+            cache.get_many(["post", "group", "missing"]),
+            {"post": {"text": "Текст"}, "group": "Группа"},
+        )
+        self.assertTrue(cache.delete("post"))
+        self.assertFalse(cache.has_key("post"))
+        cache.set("short", 1, timeout=0)
+        self.assertIsNone(cache.get("short"))
+        self.assertTrue(cache.touch("group", timeout=None))
+        cache.clear()
+        self.assertIsNone(cache.get("group"))
+
+    def test_expired_entries(self):
+        """Просроченная запись не читается и не продлевается"""
+        self.cache.set("post", 1, timeout=1)
+        self.cache.set("group", 1, timeout=1)
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get("post"))
+        self.assertFalse(self.cache.touch("group"))
+        self.assertRaises(ValueError, self.cache.incr, "post")
+
+    def test_shared_between_instances(self):
+        """Записи видны всем, кто открыл тот же файл"""
+        self.cache.set("index", "страница")
+        self.assertEqual(make_cache(self.path).get("index"), "страница")
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читавшиеся записи"""
+        cache = make_cache(self.path, MAX_ENTRIES=4, CULL_FREQUENCY=2)
+        for number in range(4):
+            cache.set(f"key{number}", number)
+            time.sleep(0.01)
+        cache.get("key0")
+        cache.set("key4", 4)
+        self.assertEqual(
+            sorted(cache.get_many([f"key{n}" for n in range(5)])),
+            ["key0", "key3", "key4"],
+        )
+
+    def test_incr_is_atomic_across_processes(self):
+        """Параллельные процессы не теряют инкременты"""
+        self.cache.set("hits", 0)
+        workers = [
+            multiprocessing.Process(target=increment, args=(self.path,))
+            for _ in range(PROCESSES)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get("hits"), INCREMENTS * PROCESSES)
+        self.assertEqual(
+            self.cache.decr("hits", 10), INCREMENTS * PROCESSES - 10
+        )
+
+
+class TestCacheLocationTest(SimpleTestCase):
+    def test_own_file(self):
+        """Тесты не трогают кэш dev-сервера"""
+        path = cache._cache._path
+        self.assertNotEqual(
+            path, os.path.join(settings.BASE_DIR, "cache.sqlite3")
+        )
+        self.assertTrue(path.startswith(tempfile.gettempdir()))
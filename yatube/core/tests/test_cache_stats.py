@@ -0,0 +1,150 @@
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import uuid
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core.cache_stats import InstrumentedCache, namespace
+
+User = get_user_model()
+
+NAMESPACES = ["views.decorators.cache.*", "template.cache.*", "generation:*"]
+
+
+def make_cache(backend="django.core.cache.backends.locmem.LocMemCache",
+               location=None, **options):
+    return InstrumentedCache("", {"OPTIONS": {
+        "WRAPPED": {
+            "BACKEND": backend,
+            "LOCATION": location or uuid.uuid4().hex,
+            "OPTIONS": options,
+        },
+        "NAMESPACES": NAMESPACES,
+    }})
+
+
+class InstrumentedCacheTest(SimpleTestCase):
+    def test_namespace(self):
+        """Ключ относится к самому длинному подходящему префиксу"""
+        patterns = sorted(NAMESPACES + ["sorl-thumbnail"], key=len)[::-1]
+        cases = {
+            "template.cache.index_page.0a1b2c": "template.cache.index_page",
+            "views.decorators.cache.cache_page..GET.0a1b":
+                "views.decorators.cache.cache_page",
+            "generation:group:test-slug": "generation:group",
+            "sorl-thumbnail||image||0a1b": "sorl-thumbnail",
+            "view.posts.views.index.0a1b": "view",
+        }
+        for key, expected in cases.items():
+            with self.subTest(key=key):
+                self.assertEqual(namespace(key, patterns), expected)
+
+    def test_counters(self):
+        """Попадания, промахи, записи и время по пространствам"""
+        instrumented = make_cache()
+        instrumented.set("template.cache.index_page.1", "страница")
+        instrumented.get("template.cache.index_page.1")
+        instrumented.get("template.cache.index_page.2")
+        instrumented.get_many(
+            ["generation:index", "template.cache.index_page.1"]
+        )
+        instrumented.delete("generation:index")
+        stats = instrumented.stats()
+        page = stats["template.cache.index_page"]
+        self.assertEqual(
+            (page["hits"], page["misses"], page["sets"]), (2, 1, 1)
+        )
+        self.assertEqual(page["operations"], 4)
+        self.assertGreater(page["seconds"], 0)
+        generation = stats["generation:index"]
+        self.assertEqual((generation["misses"], generation["deletes"]), (1, 1))
+
+    def test_reset(self):
+        """Сброс обнуляет счётчики"""
+        instrumented = make_cache()
+        instrumented.get("generation:index")
+        instrumented.reset_stats()
+        self.assertEqual(instrumented.stats(), {})
+
+    def test_evictions(self):
+        """Вытеснения SQLiteCache считаются по пространствам"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        instrumented = make_cache(
+            "core.cache.SQLiteCache",
+            os.path.join(directory, "cache.sqlite3"),
+            MAX_ENTRIES=4,
+            CULL_FREQUENCY=2,
+        )
+        for number in range(6):
+            instrumented.set(f"template.cache.post_card.{number}", number)
+        stats = instrumented.stats()
+        self.assertGreater(stats["template.cache.post_card"]["evictions"], 0)
+
+    def test_bytes_from_backend(self):
+        """Байты сообщает SQLiteCache: значение сериализуется один раз"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        instrumented = make_cache(
+            "core.cache.SQLiteCache", os.path.join(directory, "cache.sqlite3")
+        )
+        value = "страница" * 100
+        with mock.patch("pickle.dumps", wraps=pickle.dumps) as dumps:
+            instrumented.set("template.cache.index_page.1", value)
+        dumps.assert_called_once()
+        instrumented.set("generation:index", 1)
+        instrumented.incr("generation:index")
+        stats = instrumented.stats()
+        self.assertEqual(
+            stats["template.cache.index_page"]["bytes"],
+            len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)),
+        )
+        self.assertEqual(
+            stats["generation:index"]["bytes"],
+            2 * len(pickle.dumps(1, pickle.HIGHEST_PROTOCOL)),
+        )
+        self.assertNotIn("cache-stats", stats)
+
+
+class CacheStatsViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username="staff", is_staff=True)
+        cls.user = User.objects.create_user(username="auth")
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("cache_stats")
+
+    def test_staff_only(self):
+        """Статистику видит только персонал"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        client.force_login(self.staff)
+        client.get(reverse("posts:index"))
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        names = [row["namespace"] for row in response.json()["namespaces"]]
+        self.assertIn("template.cache.index_page", names)
+
+    def test_command(self):
+        """Команда печатает таблицу и JSON"""
+        self.client.get(reverse("posts:index"))
+        out = StringIO()
+        call_command("cache_stats", stdout=out)
+        self.assertIn("template.cache.index_page", out.getvalue())
+        out = StringIO()
+        call_command("cache_stats", "--json", stdout=out)
+        self.assertTrue(json.loads(out.getvalue()))
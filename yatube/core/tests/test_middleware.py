@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class AnonymousCacheMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.group = Group.objects.create(title="Группа", slug="test-slug")
+        Post.objects.create(author=cls.user, text="Пост", group=cls.group)
+        cls.urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": cls.group.slug}),
+            reverse("posts:profile", kwargs={"username": cls.user}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_served_before_sessions(self):
+        """Повторная страница гостю отдаётся до SessionMiddleware"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                with mock.patch.object(
+                    SessionMiddleware, "process_request",
+                    side_effect=AssertionError("сессия не нужна"),
+                ):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("Cookie", response["Vary"])
+                self.assertEqual(response["X-Frame-Options"], "SAMEORIGIN")
+                self.assertIn("ETag", response)
+
+    def test_foreign_cookies_share_entry(self):
+        """Посторонние куки не мешают гостю попасть в кэш"""
+        self.guest_client.get(self.urls[0])
+        self.guest_client.cookies["_ga"] = "analytics"
+        with mock.patch.object(
+            SessionMiddleware, "process_request",
+            side_effect=AssertionError("сессия не нужна"),
+        ):
+            response = self.guest_client.get(self.urls[0])
+        self.assertEqual(response.status_code, 200)
+
+    def test_session_goes_full_path(self):
+        """С кукой сессии запрос идёт через все middleware"""
+        client = Client()
+        client.force_login(self.user)
+        client.get(self.urls[0])
+        response = client.get(self.urls[0])
+        self.assertContains(response, "Пост")
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_login_required_feed(self):
+        """Ленту подписок гость из кэша не получает"""
+        url = reverse("posts:follow_index")
+        self.assertRedirects(
+            self.guest_client.get(url), f"{reverse('users:login')}?next={url}"
+        )
@@ -0,0 +1,197 @@
+import os
+import time
+import traceback
+from collections import defaultdict
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from about import urls as about_urls
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post
+from users import urls as users_urls
+
+User = get_user_model()
+BASE_DIR = os.path.abspath(settings.BASE_DIR)
+
+AUTHORS = 8
+GROUPS = 4
+POSTS = 400
+COMMENTS = 60
+
+# Допустимое число SQL-запросов на страницу: (гость, авторизованный).
+QUERY_BUDGETS = {
+    "posts:index": (1, 3),
+    "posts:group_list": (2, 4),
+    "posts:profile": (3, 6),
+    "posts:post_detail": (3, 5),
+    "posts:post_comments": (2, 2),
+    "posts:post_create": (0, 3),
+    "posts:post_edit": (0, 4),
+    "posts:add_comment": (0, 3),
+    "posts:follow_index": (0, 4),
+    "posts:profile_follow": (0, 10),
+    "posts:profile_unfollow": (0, 7),
+    "users:logout": (0, 4),
+    "users:signup": (0, 2),
+    "users:login": (0, 2),
+    "users:password_reset_form": (0, 2),
+    "users:password_change_done": (0, 2),
+    "users:password_reset_done": (0, 2),
+    "users:password_change_form": (0, 2),
+    "users:password_reset_confirm": (1, 3),
+    "users:password_reset_complete": (0, 2),
+    "about:author": (0, 2),
+    "about:tech": (0, 2),
+}
+# Суммарное время SQL-запросов одной страницы, секунды.
+QUERY_TIME_BUDGET = 0.25
+
+
+def call_site():
+    """Место вызова запроса: ближайший кадр кода проекта.
+
+    Если запрос пришёл целиком из Django (сессии, авторизация),
+    берётся ближайший кадр вне ORM.
+    """
+    skip = (os.path.abspath(__file__), os.path.join(BASE_DIR, "manage.py"))
+    frames = [
+        frame for frame in reversed(traceback.extract_stack()[:-2])
+        if os.path.abspath(frame.filename) not in skip
+    ]
+    for frame in frames:
+        if os.path.abspath(frame.filename).startswith(BASE_DIR):
+            path = os.path.relpath(frame.filename, BASE_DIR)
+            return f"{path}:{frame.lineno} ({frame.name})"
+    for frame in frames:
+        if f"django{os.sep}db{os.sep}" not in frame.filename:
+            return f"{frame.filename}:{frame.lineno} ({frame.name})"
+    return "?"
+
+
+class QueryLog:
+    """Обёртка execute: запоминает SQL, время и место вызова."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, time.perf_counter() - start, call_site())
+            )
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def report(self):
+        by_site = defaultdict(list)
+        for sql, duration, site in self.queries:
+            by_site[site].append(f"    [{duration * 1000:.1f} ms] {sql}")
+        return "\n".join(
+            f"  {site}: {len(lines)}\n" + "\n".join(lines)
+            for site, lines in by_site.items()
+        )
+
+
+class QueryBudgetTests(TestCase):
+    """Бюджеты SQL-запросов для всех страниц на ленте реального размера."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                username=f"author{number}",
+                first_name="Имя",
+                last_name=f"Фамилия{number}",
+            )
+            for number in range(AUTHORS)
+        ]
+        cls.reader = User.objects.create_user(username="reader")
+        groups = [
+            Group.objects.create(
+                title=f"Группа {number}",
+                slug=f"group-{number}",
+                description="Описание",
+            )
+            for number in range(GROUPS)
+        ]
+        Post.objects.bulk_create(
+            Post(
+                author=cls.authors[number % AUTHORS],
+                group=groups[number % GROUPS] if number % 3 else None,
+                text=f"Пост {number}",
+            )
+            for number in range(POSTS)
+        )
+        for author in cls.authors[1:]:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.post = Post.objects.create(
+            author=cls.reader, text="Обсуждаемый пост", group=groups[0]
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=cls.authors[number % AUTHORS],
+                text=f"Комментарий {number}",
+            )
+            for number in range(COMMENTS)
+        )
+        call_command("rebuild_counters", stdout=StringIO())
+        cls.url_kwargs = {
+            "slug": groups[0].slug,
+            "username": cls.authors[0].username,
+            "post_id": cls.post.pk,
+            "uidb64": "MQ",
+            "token": "set-password",
+        }
+
+    def url_names(self):
+        for module in (posts_urls, users_urls, about_urls):
+            for pattern in module.urlpatterns:
+                yield f"{module.app_name}:{pattern.name}", pattern
+
+    def check_budget(self, name, url, budget, authorized):
+        client = Client()
+        if authorized:
+            # Свежая сессия: logout в списке URL закрывает предыдущую.
+            client.force_login(self.reader)
+        cache.clear()
+        log = QueryLog()
+        with connection.execute_wrapper(log):
+            client.get(url)
+        details = (
+            f"{name} ({url}): {len(log.queries)} запросов, "
+            f"{log.total_time * 1000:.1f} ms\n{log.report()}"
+        )
+        self.assertLessEqual(len(log.queries), budget, details)
+        self.assertLessEqual(log.total_time, QUERY_TIME_BUDGET, details)
+
+    def test_every_url_has_budget(self):
+        """Для каждого URL задан бюджет запросов."""
+        for name, _ in self.url_names():
+            with self.subTest(name=name):
+                self.assertIn(name, QUERY_BUDGETS)
+
+    def test_query_budgets(self):
+        """Страницы укладываются в бюджет запросов для гостя и автора."""
+        for name, pattern in self.url_names():
+            if name not in QUERY_BUDGETS:
+                continue
+            url = reverse(name, kwargs={
+                key: self.url_kwargs[key]
+                for key in pattern.pattern.converters
+            })
+            for authorized, budget in enumerate(QUERY_BUDGETS[name]):
+                with self.subTest(name=name, authorized=bool(authorized)):
+                    self.check_budget(name, url, budget, authorized)
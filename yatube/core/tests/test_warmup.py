@@ -0,0 +1,47 @@
+import os
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from core.warmup import resolve_urls, warm_up
+
+CACHED_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    "OPTIONS": {
+        **settings.TEMPLATES[0]["OPTIONS"],
+        "loaders": [(
+            "django.template.loaders.cached.Loader",
+            [
+                "django.template.loaders.filesystem.Loader",
+                "django.template.loaders.app_directories.Loader",
+            ],
+        )],
+    },
+}]
+
+
+class WarmupTest(SimpleTestCase):
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_templates_cached(self):
+        """Прогрев кладёт все шаблоны проекта в кэширующий загрузчик"""
+        total = sum(
+            len(files) for _, _, files in os.walk(settings.TEMPLATES_DIR)
+        )
+        timings = warm_up()
+        self.assertEqual(timings["templates"][0], total)
+        loader = engines["django"].engine.template_loaders[0]
+        self.assertEqual(len(loader.get_template_cache), total)
+
+    def test_urls_resolved(self):
+        """Прогрев обходит все URL, включая вложенные include()"""
+        self.assertGreater(resolve_urls(), 20)
+
+    def test_command(self):
+        """Команда warmup печатает время этапов"""
+        out = StringIO()
+        call_command("warmup", stdout=out)
+        self.assertIn("templates:", out.getvalue())
+        self.assertIn("urls:", out.getvalue())
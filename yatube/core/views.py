@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
 
+from .cache_stats import summarize
+
 
 def page_not_found(request, exception):
     return render(request, "core/404.html", {"path": request.path}, status=404)
@@ -15,3 +20,12 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, "core/403.html", status=403)
+
+
+@staff_member_required
+def cache_stats(request):
+    """Статистика кэша по пространствам имён ключей (только персоналу)."""
+    stats = getattr(cache, "stats", None)
+    if stats is None:
+        raise Http404("Кэш без статистики")
+    return JsonResponse({"namespaces": summarize(stats())})
@@ -0,0 +1,68 @@
+import logging
+import os
+import time
+
+from django.template import TemplateSyntaxError, engines
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(engine):
+    """Имена всех шаблонов из каталогов ``DIRS`` движка."""
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.relpath(os.path.join(root, name), directory)
+                yield path.replace(os.sep, "/")
+
+
+def compile_templates():
+    """Компилирует шаблоны, чтобы кэширующий загрузчик их запомнил."""
+    compiled = 0
+    for backend in engines.all():
+        engine = getattr(backend, "engine", None)
+        if engine is None:
+            continue
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception("Шаблон %s не компилируется", name)
+                continue
+            compiled += 1
+    return compiled
+
+
+def resolve_urls(resolver=None):
+    """Компилирует регулярные выражения и обратные словари всех URL."""
+    resolver = resolver or get_resolver()
+    resolver.reverse_dict  # заполняет словари для reverse()
+    resolved = 0
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex  # регулярка компилируется при обращении
+        if isinstance(pattern, URLResolver):
+            resolved += resolve_urls(pattern)
+        else:
+            resolved += 1
+    return resolved
+
+
+def warm_up():
+    """Прогрев процесса: шаблоны и URL до первого запроса.
+
+    Возвращает словарь ``{этап: (число объектов, секунды)}``.
+    """
+    timings = {}
+    for stage, step in (
+        ("templates", compile_templates),
+        ("urls", resolve_urls),
+    ):
+        start = time.perf_counter()
+        count = step()
+        timings[stage] = (count, time.perf_counter() - start)
+        logger.info(
+            "Прогрев %s: %d за %.1f мс", stage, count,
+            timings[stage][1] * 1000,
+        )
+    return timings
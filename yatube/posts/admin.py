@@ -11,6 +11,9 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).for_admin()
+
 
 admin.site.register(Post, PostAdmin,)
 admin.site.register(Group)
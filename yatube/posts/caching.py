@@ -0,0 +1,158 @@
+import hashlib
+import math
+import random
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Сколько секунд после истечения запись ещё можно отдавать устаревшей,
+# пока её пересчитывает другой запрос.
+GRACE_PERIOD = 60
+# Сколько секунд держится блокировка пересчёта (и сколько ждёт запрос,
+# которому нечего отдать).
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+
+
+def vary_cookies(request):
+    """Куки, от которых зависит страница: сессия и CSRF.
+
+    Остальные куки (аналитика и т. п.) Django не читает, поэтому гости
+    с ними получают общую запись кэша.
+    """
+    return ":".join(
+        request.COOKIES.get(name, "")
+        for name in (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME)
+    )
+
+
+def view_cache_key(request, view):
+    """Ключ ответа: представление, полный адрес и куки сессии и CSRF."""
+    raw = ":".join((request.build_absolute_uri(), vary_cookies(request)))
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"view.{view.__module__}.{view.__qualname__}.{digest}"
+
+
+def is_fresh(entry, version, beta):
+    """Запись свежая и не выпала в ранний пересчёт.
+
+    Ранний пересчёт (XFetch): чем ближе истечение и чем дольше пересчёт,
+    тем вероятнее, что запрос обновит запись заранее, до истечения.
+    """
+    if entry is None or entry["version"] != version:
+        return False
+    jitter = -entry["delta"] * beta * math.log(1 - random.random())
+    return time.time() + jitter < entry["expires"]
+
+
+def lookup(view, version, request, *args, **kwargs):
+    """Ключ ответа, текущая версия данных и запись из кэша."""
+    key = view_cache_key(request, view)
+    current = None
+    if version is not None:
+        current = version(request, *args, **kwargs)
+    return key, current, cache.get(key)
+
+
+def is_cacheable(response):
+    """Обычный ответ 200 без потоковой выдачи и без новых кук."""
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def recompute(key, current, lifetime, view, request, *args, **kwargs):
+    """Вызывает представление и кладёт ответ в кэш на ``lifetime``
+    секунд (срок свежести плюс ``grace``)."""
+    timeout, grace = lifetime
+    start = time.perf_counter()
+    response = view(request, *args, **kwargs)
+    if not is_cacheable(response):
+        return response
+    if hasattr(response, "render") and callable(response.render):
+        response.render()
+    cache.set(key, {
+        "response": response,
+        "version": current,
+        "validators": getattr(request, "validators", None),
+        "expires": time.time() + timeout,
+        "delta": time.perf_counter() - start,
+    }, timeout + grace)
+    return response
+
+
+def wait(key, lock, current, lock_timeout):
+    """Ждёт, пока другой запрос пересчитает запись, но не дольше
+    ``lock_timeout``; ``None``, если не дождался."""
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline and cache.has_key(lock):
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry["version"] == current:
+            return entry
+    return None
+
+
+def stale_response(entry):
+    """Устаревший ответ со своими ETag и Last-Modified, а не текущей
+    версии (см. ``conditional``)."""
+    response = entry["response"]
+    response.stale_validators = entry.get("validators")
+    return response
+
+
+def peek(view, version, beta, request, *args, **kwargs):
+    """Свежий ответ из кэша или ``None``; представление не вызывается."""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    _, current, entry = lookup(view, version, request, *args, **kwargs)
+    if is_fresh(entry, current, beta):
+        return entry["response"]
+    return None
+
+
+def cache_view(timeout, version=None, grace=GRACE_PERIOD,
+               lock_timeout=LOCK_TIMEOUT, beta=1.0):
+    """Кэш ответов представления с защитой от одновременного пересчёта.
+
+    Пересчитывает запись только запрос, взявший короткую блокировку;
+    остальные в это время получают устаревший ответ (не дольше ``grace``
+    секунд после истечения), а если его нет — ждут пересчёта.
+    ``version(request, *args, **kwargs)`` — необязательная версия данных
+    (например, поколение ленты): запись другой версии считается
+    устаревшей, но годится как запасной ответ. Запись хранит
+    ``request.validators`` от ``conditional``, и устаревший ответ
+    несёт их в ``stale_validators``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            key, current, entry = lookup(
+                view, version, request, *args, **kwargs
+            )
+            if is_fresh(entry, current, beta):
+                return entry["response"]
+            lock = f"{key}.lock"
+            if cache.add(lock, True, lock_timeout):
+                try:
+                    return recompute(
+                        key, current, (timeout, grace),
+                        view, request, *args, **kwargs
+                    )
+                finally:
+                    cache.delete(lock)
+            if entry is None:
+                entry = wait(key, lock, current, lock_timeout)
+            if entry is not None:
+                return stale_response(entry)
+            return view(request, *args, **kwargs)
+
+        wrapper.peek = partial(peek, view, version, beta)
+        return wrapper
+    return decorator
@@ -0,0 +1,97 @@
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .caching import vary_cookies
+
+# Сколько секунд браузер гостя может показывать страницу без запроса.
+ANONYMOUS_MAX_AGE = 20
+
+
+def make_etag(request, *parts):
+    """ETag страницы: её состояние плюс куки сессии и CSRF.
+
+    Страницы различаются по этим кукам, поэтому и ETag не должен
+    совпадать у разных пользователей и после смены сессии.
+    """
+    raw = ":".join(map(str, parts + (vary_cookies(request),)))
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def patch_browser_cache(request, response):
+    """Гостю разрешено кэширование, пользователю — только с проверкой."""
+    del response["Expires"]
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        patch_cache_control(response, private=True, no_cache=True, max_age=0)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=ANONYMOUS_MAX_AGE
+        )
+
+
+def revalidate_stale(request, response):
+    """Проверяет устаревший ответ ``cache_view`` по его собственным
+    валидаторам: возвращает ответ (или 304), его ETag и время изменения."""
+    etag, modified = response.stale_validators
+    response = get_conditional_response(
+        request, etag=etag, last_modified=modified, response=response
+    )
+    return response, etag, modified
+
+
+def patch_validators(request, response, etag, modified, stale=False):
+    """Заголовки ETag, Last-Modified и Cache-Control ответа 200 или 304.
+
+    Устаревший ответ браузер перепроверяет при каждом показе.
+    """
+    if response.status_code not in (200, 304):
+        return
+    response["ETag"] = etag
+    if modified is not None:
+        response["Last-Modified"] = http_date(modified)
+    patch_browser_cache(request, response)
+    if stale:
+        patch_cache_control(response, max_age=0, no_cache=True)
+
+
+def conditional(validators):
+    """Отвечает 304 без рендеринга, если страница не изменилась.
+
+    ``validators(request, *args, **kwargs)`` возвращает пару
+    ``(части ETag, время изменения)`` или ``None``, если проверять
+    нечего (например, страницы не существует). Представление может
+    вернуть ``None`` (нет готового ответа) — тогда вернётся ``None``.
+    Устаревший ответ из ``cache_view`` получает валидаторы своей
+    версии, и браузер перепроверяет его при каждом показе.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            state = validators(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            parts, modified = state
+            etag = make_etag(request, *parts)
+            if modified is not None:
+                modified = timegm(modified.utctimetuple())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified
+            )
+            if response is None:
+                request.validators = (etag, modified)
+                response = view(request, *args, **kwargs)
+            if response is None:
+                return None
+            stale = getattr(response, "stale_validators", None) is not None
+            if stale:
+                response, etag, modified = revalidate_stale(request, response)
+            patch_validators(request, response, etag, modified, stale)
+            return response
+        return wrapper
+    return decorator
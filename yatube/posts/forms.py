@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import normalize
 from .models import Post, Comment
 
 
@@ -8,6 +10,21 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ("text", "group", "image")
 
+    def clean_image(self):
+        image = self.cleaned_data["image"]
+        # Уже сохранённая картинка приходит как FieldFile: её не трогаем.
+        if isinstance(image, UploadedFile):
+            image, self.image_size = normalize(image)
+        return image
+
+    def save(self, commit=True):
+        if "image" in self.changed_data:
+            self.instance.image_width, self.instance.image_height = (
+                getattr(self, "image_size", (None, None))
+            )
+            self.instance.image_placeholder = ""
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,107 @@
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.views.decorators.vary import vary_on_cookie
+
+from .caching import cache_view
+from .conditional import conditional
+
+# У каждой ленты (index, group:<slug>, author:<username>, post:<id>,
+# follow:<user_id>, pulled:<author_id>) есть поколение, которым помечены
+# её закэшированные страницы.
+# Сигналы моделей сдвигают его при изменении ленты, поэтому страницы
+# хранятся часами и всё равно обновляются сразу после изменений.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def _key(scope):
+    return f"generation:{scope}"
+
+
+def _seed():
+    # Поколение — время последнего изменения в наносекундах: счётчик,
+    # вытесненный из кэша, не начнётся заново с использованного значения.
+    return time.time_ns()
+
+
+def current(*scopes):
+    """Текущее поколение набора лент одной строкой для ключа кэша."""
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _seed(), None)
+            found[key] = cache.get(key)
+    return ".".join(str(found[key]) for key in keys)
+
+
+def bump(*scopes):
+    """Сдвигает поколения лент: их закэшированные страницы устаревают.
+
+    Все поколения пишутся одним ``set_many``, так что пост автора
+    с тысячами подписчиков обходится одной операцией с кэшем.
+    """
+    if scopes:
+        seed = _seed()
+        cache.set_many({_key(scope): seed for scope in scopes}, None)
+
+
+def feed_version(request, *args, **kwargs):
+    return request.feed_generation
+
+
+def feed_validators(request, *args, **kwargs):
+    return (request.feed_generation,), None
+
+
+def cache_feed(*scopes, first_page_only=False, guests=True):
+    """Кэширует страницу ленты до смены её поколения.
+
+    ``scopes`` — шаблоны вида ``"group:{slug}"``, которые заполняются
+    аргументами представления, или функции ``(request, **kwargs)``,
+    возвращающие список лент. Поколение доступно представлению как
+    ``request.feed_generation`` и служит ETag страницы. При
+    ``first_page_only`` остальные страницы ленты не кэшируются целиком.
+    ``guests=False`` — лента только для вошедших: гостям её не отдаёт
+    даже ``AnonymousCacheMiddleware``.
+    """
+    def decorator(view):
+        # Ответы различаются по Cookie: пусть это видят и прокси.
+        view_cache = cache_view(
+            FEED_CACHE_TIMEOUT, version=feed_version
+        )(vary_on_cookie(view))
+        cached_view = conditional(feed_validators)(view_cache)
+        cached_only = conditional(feed_validators)(view_cache.peek)
+
+        def set_generation(request, kwargs):
+            names = []
+            for scope in scopes:
+                if callable(scope):
+                    names.extend(scope(request, **kwargs))
+                else:
+                    names.append(scope.format(**kwargs))
+            request.feed_generation = current(*names)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            set_generation(request, kwargs)
+            if first_page_only and request.GET:
+                return view(request, *args, **kwargs)
+            return cached_view(request, *args, **kwargs)
+
+        def cached_response(request, *args, **kwargs):
+            """Готовый ответ (или 304) без вызова представления.
+
+            ``None``, если свежего ответа в кэше нет. Так гостей
+            обслуживает ``core.middleware.AnonymousCacheMiddleware``.
+            """
+            set_generation(request, kwargs)
+            if first_page_only and request.GET:
+                return None
+            return cached_only(request, *args, **kwargs)
+
+        if guests:
+            wrapper.cached_response = cached_response
+        return wrapper
+    return decorator
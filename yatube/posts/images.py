@@ -0,0 +1,98 @@
+import base64
+import math
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+# Форматы, которые хранятся как есть, если картинка не больше предела
+# и не повёрнута в EXIF.
+KEPT_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+EXIF_ORIENTATION = 0x0112
+# Заглушка 8 пикселей по большей стороне — около 200 байт в data URI;
+# браузер растягивает её со сглаживанием, и она выглядит размытой.
+PLACEHOLDER_SIDE = 8
+
+
+def too_large(limit):
+    return ValidationError(
+        "Картинка слишком большая: не больше %(limit)s Мп.",
+        code="image_too_large",
+        params={"limit": f"{limit / 10 ** 6:g}"},
+    )
+
+
+def normalize(upload):
+    """Картинка поста, уменьшенная до ``POST_IMAGE_MAX_SIDE`` и повёрнутая по
+    EXIF, и её размеры ``(width, height)``.
+
+    JPEG декодируется сразу в уменьшенном масштабе (``draft``) и ограничен
+    ``POST_IMAGE_MAX_PIXELS`` уже после него. Остальные форматы декодируются
+    целиком, поэтому для них предел ниже: ``POST_IMAGE_MAX_FULL_PIXELS``.
+    Результат пишется во временный файл. Небольшие картинки без поворота
+    хранятся как есть.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            source_format = image.format
+            rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+            if max(image.size) <= max_side and not rotated:
+                if source_format in KEPT_FORMATS:
+                    upload.seek(0)
+                    return upload, image.size
+            ratio = min(max_side / max(image.size), 1)
+            image.draft("RGB", tuple(
+                max(math.ceil(side * ratio), 1) for side in image.size
+            ))
+            width, height = image.size
+            limit = settings.POST_IMAGE_MAX_PIXELS
+            if source_format != "JPEG":
+                limit = settings.POST_IMAGE_MAX_FULL_PIXELS
+            if width * height > limit:
+                raise too_large(limit)
+            # Сначала уменьшение: поворот копирует картинку целиком.
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ("RGBA", "LA") or (
+                image.mode == "P" and "transparency" in image.info
+            )
+            if has_alpha:
+                image_format, extension = "PNG", "png"
+                options = {"optimize": True}
+            else:
+                image = image.convert("RGB")
+                image_format, extension = "JPEG", "jpg"
+                options = {
+                    "quality": 85, "optimize": True, "progressive": True,
+                }
+            normalized = tempfile.TemporaryFile()
+            image.save(normalized, image_format, **options)
+            size = image.size
+    except OSError:
+        # Например, обрезанный файл: заголовок проверку прошёл, а данных нет.
+        raise ValidationError(
+            "Картинка повреждена или не поддерживается.",
+            code="invalid_image",
+        )
+    normalized.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return File(normalized, name=f"{name}.{extension}"), size
+
+
+def placeholder(file_):
+    """Крошечная копия картинки (LQIP) как ``data:`` URI для вставки
+    прямо в страницу, пока не загрузилась миниатюра."""
+    with file_.open("rb"), Image.open(file_) as image:
+        image.draft("RGB", (PLACEHOLDER_SIDE, PLACEHOLDER_SIDE))
+        image = image.convert("RGB")
+        image.thumbnail((PLACEHOLDER_SIDE, PLACEHOLDER_SIDE))
+        content = BytesIO()
+        image.save(content, "PNG", optimize=True)
+    encoded = base64.b64encode(content.getvalue()).decode("ascii")
+    return f"data:image/png;base64,{encoded}"
@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def index_path():
+    """Файл индекса: ``THUMBNAIL_KVSTORE_PATH``, а по умолчанию рядом с
+    ``MEDIA_ROOT``, но не в нём: каталог раздаётся публично."""
+    path = getattr(settings, "THUMBNAIL_KVSTORE_PATH", None)
+    parent = os.path.dirname(os.path.normpath(settings.MEDIA_ROOT))
+    return path or os.path.join(parent, "thumbnails.sqlite3")
+
+
+class KVStore(KVStoreBase):
+    """Хранилище ключей sorl-thumbnail в компактном файле SQLite.
+
+    В отличие от стандартного (кэш, а при промахе строка в базе), ответ
+    всегда даёт один локальный запрос без сети, а ``get_many`` находит
+    миниатюры всех картинок страницы одним запросом.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    def _connection(self):
+        # Путь читается при каждом вызове: его меняют тесты.
+        # После fork — новое соединение.
+        local = self._local
+        path = index_path()
+        if getattr(local, "key", None) != (os.getpid(), path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            connection = sqlite3.connect(path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(SCHEMA)
+            local.connection = connection
+            local.key = (os.getpid(), path)
+        return local.connection
+
+    def get_many(self, image_files):
+        """Записи ``image_files`` одним запросом: список той же длины,
+        ``None`` для отсутствующих."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        if not keys:
+            return []
+        found = dict(self._connection().execute(
+            "SELECT key, value FROM thumbnails "
+            f"WHERE key IN ({', '.join('?' * len(keys))})",
+            keys,
+        ))
+        return [
+            deserialize_image_file(found[key]) if key in found else None
+            for key in keys
+        ]
+
+    def _get_raw(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM thumbnails WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_raw(self, key, value):
+        self._connection().execute(
+            "INSERT INTO thumbnails (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def _delete_raw(self, *keys):
+        self._connection().executemany(
+            "DELETE FROM thumbnails WHERE key = ?", [(key,) for key in keys]
+        )
+
+    def _find_keys_raw(self, prefix):
+        # Диапазон вместо LIKE: в ключах бывают «_» и «%».
+        return [
+            key for (key,) in self._connection().execute(
+                "SELECT key FROM thumbnails WHERE key >= ? AND key < ?",
+                (prefix, prefix + "\U0010ffff"),
+            )
+        ]
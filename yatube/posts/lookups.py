@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.http import Http404
+
+from . import generations
+from .models import Group
+
+User = get_user_model()
+
+LOOKUP_CACHE_SIZE = 1024
+# Как часто процесс сверяет поколение с общим кэшем: дольше этого чужое
+# изменение записи не видно.
+LOOKUP_CHECK_INTERVAL = 1
+
+
+class LookupCache:
+    """LRU «значение поля → объект» в памяти процесса.
+
+    Хранятся только значения ``fields``, и на каждое попадание
+    собирается новый экземпляр модели без запроса к базе, так что
+    запросы не делят между собой изменяемые объекты. Сохранение или
+    удаление записи сдвигает поколение ``scope`` в общем кэше. Процесс
+    сверяется с ним не чаще раза в ``check_interval`` секунд, так что
+    попадание обходится без обращения к кэшу, а чужие изменения видны
+    не позже чем через ``check_interval``; свои — сразу.
+    """
+
+    def __init__(self, queryset, field, fields, scope,
+                 maxsize=LOOKUP_CACHE_SIZE,
+                 check_interval=LOOKUP_CHECK_INTERVAL):
+        self.queryset = queryset
+        self.field = field
+        self.fields = fields
+        self.scope = scope
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._generation = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def _current_generation(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked < self.check_interval:
+                return self._generation
+        generation = generations.current(self.scope)
+        with self._lock:
+            self._checked = now
+        return generation
+
+    def get_or_404(self, value):
+        generation = self._current_generation()
+        with self._lock:
+            if generation != self._generation:
+                self._rows.clear()
+                self._generation = generation
+            row = self._rows.get(value)
+            if row is not None:
+                self._rows.move_to_end(value)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if row is None:
+            row = self.queryset.filter(**{self.field: value}).values_list(
+                *self.fields
+            ).first()
+            if row is None:
+                raise Http404(
+                    f"{self.queryset.model._meta.object_name} не найден"
+                )
+            with self._lock:
+                if generation == self._generation:
+                    self._rows[value] = row
+                    if len(self._rows) > self.maxsize:
+                        self._rows.popitem(last=False)
+        return self.queryset.model.from_db(
+            self.queryset.db, self.fields, row
+        )
+
+    def invalidate(self):
+        """Сбрасывает кэш во всех процессах."""
+        generations.bump(self.scope)
+        with self._lock:
+            self._rows.clear()
+            self._checked = float("-inf")
+
+
+groups = LookupCache(
+    Group.objects.all(),
+    "slug",
+    ("id", "title", "slug", "description"),
+    scope="lookup:group",
+)
+users = LookupCache(
+    User.objects.all(),
+    "username",
+    ("id", "username", "first_name", "last_name"),
+    scope="lookup:user",
+)
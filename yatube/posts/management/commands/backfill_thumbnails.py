@@ -0,0 +1,114 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from posts import generations, thumbnails
+from posts.models import Post
+from posts.signals import shown_in_feeds
+
+logger = logging.getLogger(__name__)
+
+
+def backfill(post_id):
+    """Миниатюры одного поста: ``(создано ли что-то, удалено лишних)``
+    или ``None``, если картинку обработать не удалось.
+
+    Поколения лент не сдвигаются: команда сдвигает их раз на пачку.
+    """
+    try:
+        post = Post.objects.filter(pk=post_id).only("image").first()
+        if post is None or not post.image:
+            return False, 0
+        pruned = thumbnails.prune_stale(post.image)
+        return thumbnails.pregenerate(post_id, bump=False), pruned
+    except Exception:
+        logger.exception("Миниатюры поста %s не созданы", post_id)
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Готовит все миниатюры картинок постов в пуле процессов и удаляет "
+        "миниатюры, которых больше нет в настройках."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(),
+            help="Число процессов; 1 — без пула, в этом процессе.",
+        )
+        parser.add_argument(
+            "--batch", type=int, default=100,
+            help="Постов за раз; после каждой пачки — строка прогресса.",
+        )
+        parser.add_argument(
+            "--rate", type=float, default=0,
+            help="Не больше стольких постов в секунду (0 — без предела).",
+        )
+        parser.add_argument(
+            "--after", type=int, default=0,
+            help="Продолжить с поста, следующего за этим id.",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options["workers"], 1)
+        rate = options["rate"]
+        posts = Post.objects.exclude(image="").order_by("pk")
+        total = posts.filter(pk__gt=options["after"]).count()
+        # Новые процессы, а не fork: им не достаются соединения с базой
+        # и кэшем и потоки пула миниатюр этого процесса.
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) if workers > 1 else None
+        last = options["after"]
+        done = generated = pruned = failed = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                batch = list(posts.filter(pk__gt=last).values_list(
+                    "pk", flat=True
+                )[:options["batch"]])
+                if not batch:
+                    break
+                results = (
+                    pool.map(backfill, batch) if pool
+                    else map(backfill, batch)
+                )
+                updated = []
+                for post_id, result in zip(batch, results):
+                    if result is None:
+                        failed += 1
+                        continue
+                    generated += result[0]
+                    pruned += result[1]
+                    if result[0]:
+                        updated.append(post_id)
+                if updated:
+                    generations.bump(*shown_in_feeds(
+                        Post.objects.filter(pk__in=updated)
+                    ))
+                last = batch[-1]
+                done += len(batch)
+                elapsed = time.perf_counter() - start
+                if rate and done / rate > elapsed:
+                    time.sleep(done / rate - elapsed)
+                    elapsed = done / rate
+                self.stdout.write(
+                    f"{done}/{total} постов, {done / elapsed:.1f} в секунду, "
+                    f"последний id {last}"
+                )
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(
+            f"Готово: обновлено постов {generated}, удалено лишних "
+            f"миниатюр {pruned}, ошибок {failed} за "
+            f"{time.perf_counter() - start:.1f} с."
+        )
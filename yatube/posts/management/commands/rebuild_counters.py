@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import AuthorStats, Follow, Group, Post
+
+User = get_user_model()
+
+
+def count_of(model, field):
+    rows = model.objects.filter(**{field: OuterRef("pk")}).order_by()
+    return Coalesce(Subquery(
+        rows.values(field).annotate(total=Count("pk")).values("total")
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики постов и подписчиков авторов и групп."
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        missing = User.objects.filter(
+            Q(posts__isnull=False) | Q(following__isnull=False),
+            stats__isnull=True,
+        ).order_by().values_list("pk", flat=True).distinct()
+        AuthorStats.objects.bulk_create(
+            AuthorStats(author_id=author_id) for author_id in missing
+        )
+        groups = Group.objects.update(posts_count=count_of(Post, "group"))
+        authors = AuthorStats.objects.update(
+            posts_count=count_of(Post, "author"),
+            followers_count=count_of(Follow, "author"),
+        )
+        AuthorStats.objects.filter(
+            followers_count__gt=settings.FOLLOW_FEED_PULL_THRESHOLD
+        ).update(pulled=True)
+        self.stdout.write(f"{Group._meta.verbose_name_plural}: {groups}")
+        self.stdout.write(
+            f"{AuthorStats._meta.verbose_name_plural}: {authors}"
+        )
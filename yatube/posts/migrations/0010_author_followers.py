@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_followers(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    known = AuthorStats.objects.values_list('author_id', flat=True)
+    AuthorStats.objects.bulk_create(
+        AuthorStats(author_id=author_id)
+        for author_id in Follow.objects.exclude(
+            author_id__in=known
+        ).order_by().values_list('author_id', flat=True).distinct()
+    )
+    follows = Follow.objects.filter(author_id=OuterRef('pk')).order_by()
+    AuthorStats.objects.update(followers_count=Coalesce(Subquery(
+        follows.values('author').annotate(total=Count('pk')).values('total')
+    ), 0))
+    AuthorStats.objects.filter(
+        followers_count__gt=settings.FOLLOW_FEED_PULL_THRESHOLD
+    ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='authorstats',
+            name='pulled',
+            field=models.BooleanField(default=False, help_text='Посты не раскладываются по лентам подписчиков, а подмешиваются при чтении ленты подписок', verbose_name='Посты читаются из ленты автора'),
+        ),
+        migrations.RunPython(fill_followers, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import connections, models
+from django.db.models import signals
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -9,6 +11,9 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        "Число постов", default=0, editable=False
+    )
 
     class Meta:
         verbose_name = "Группа"
@@ -18,12 +23,98 @@ class Group(models.Model):
         return self.title
 
 
+class AuthorStatsManager(models.Manager):
+    def for_author(self, author):
+        """Счётчики автора; несохранённые нули, если постов ещё не было."""
+        return (
+            self.filter(author=author).first()
+            or self.model(author=author)
+        )
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats"
+    )
+    posts_count = models.PositiveIntegerField("Число постов", default=0)
+    followers_count = models.PositiveIntegerField(
+        "Число подписчиков", default=0
+    )
+    pulled = models.BooleanField(
+        "Посты читаются из ленты автора",
+        default=False,
+        help_text="Посты не раскладываются по лентам подписчиков, "
+                  "а подмешиваются при чтении ленты подписок"
+    )
+
+    objects = AuthorStatsManager()
+
+    class Meta:
+        verbose_name = "Счётчики автора"
+        verbose_name_plural = "Счётчики авторов"
+
+    def __str__(self) -> str:
+        return str(self.author)
+
+
+class PostQuerySet(models.QuerySet):
+    """Готовые выборки постов под конкретные страницы.
+
+    Каждая выборка подтягивает автора и группу тем же запросом и
+    читает только те колонки, которые показывает шаблон.
+    """
+    FEED_FIELDS = (
+        "text",
+        "pub_date",
+        "updated",
+        "image",
+        "image_width",
+        "image_height",
+        "image_placeholder",
+        "author__username",
+        "author__first_name",
+        "author__last_name",
+        "group__slug",
+    )
+    DETAIL_FIELDS = FEED_FIELDS + (
+        "group__title",
+        "author__stats__posts_count",
+    )
+    ADMIN_FIELDS = (
+        "text",
+        "pub_date",
+        "author__username",
+        "group__title",
+    )
+
+    def for_feed(self):
+        """Карточки постов в лентах."""
+        return self.select_related("author", "group").only(*self.FEED_FIELDS)
+
+    def for_detail(self):
+        """Страница поста и его редактирование."""
+        return self.select_related("author__stats", "group").only(
+            *self.DETAIL_FIELDS
+        )
+
+    def for_admin(self):
+        """Список постов в админке."""
+        return self.select_related("author", "group").only(
+            *self.ADMIN_FIELDS
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         "Текст поста",
         help_text="Введите текст поста"
     )
     pub_date = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Входит в ключ кэша карточки поста: меняется при каждом сохранении.
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -40,18 +131,59 @@ class Post(models.Model):
         help_text="Категория, в которой будет пост"
     )
 
+    # Одинаковые картинки разных постов — один файл; по индексу
+    # проверяется, ссылается ли на файл ещё кто-нибудь.
     image = models.ImageField(
         "Картинка",
         upload_to="posts/",
-        blank=True
+        storage=ContentAddressedStorage(),
+        blank=True,
+        db_index=True,
+    )
+    # Размеры картинки для вёрстки, чтобы не открывать файл. Их пишет
+    # PostForm при загрузке: width_field/height_field открывали бы файл
+    # при чтении каждого поста, у которого размеры ещё не заполнены.
+    image_width = models.PositiveIntegerField(
+        "Ширина картинки", null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        "Высота картинки", null=True, blank=True, editable=False
     )
+    # Размытая заглушка картинки в data URI: её готовит пул миниатюр, и
+    # карточка вставляет её в страницу, не обращаясь к хранилищу.
+    image_placeholder = models.TextField(
+        "Заглушка картинки", blank=True, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta():
-        ordering = ["-pub_date"]
+        ordering = ["-pub_date", "-id"]
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"]),
+            models.Index(fields=["author", "-pub_date", "-id"]),
+            models.Index(fields=["group", "-pub_date", "-id"]),
+        ]
 
     def __str__(self) -> str:
         return self.text
 
+    def save(self, *args, **kwargs):
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            # Содержимое, которое хранилище отложило для
+            # restore_reused_image, не должно пережить неудачное сохранение.
+            self.image.storage.take_reused(self.image.name)
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_list(self):
+        """Комментарии под постом: текст, дата и имя автора."""
+        return self.select_related("author").only(
+            "post", "text", "created", "author__username"
+        )
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -72,13 +204,87 @@ class Comment(models.Model):
     )
     created = models.DateTimeField("Дата публикации", auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta():
-        ordering = ["-created"]
+        ordering = ["-created", "-id"]
+        indexes = [
+            models.Index(fields=["post", "-created", "-id"]),
+        ]
 
     def __str__(self) -> str:
         return self.text
 
 
+class FollowManager(models.Manager):
+    """Подписки одним SQL-запросом без гонок «проверить, потом записать».
+
+    Запись и удаление идут в обход ORM, поэтому сигналы
+    ``post_save``/``post_delete`` отправляются вручную и только если
+    строка действительно появилась или исчезла.
+    """
+
+    def _execute(self, sql, params):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def _columns(self):
+        opts = self.model._meta
+        quote = connections[self.db].ops.quote_name
+        return (
+            quote(opts.db_table),
+            quote(opts.get_field("user").column),
+            quote(opts.get_field("author").column),
+        )
+
+    def follow(self, user, author):
+        """Подписывает ``user`` на ``author``; True, если подписки не было."""
+        ops = connections[self.db].ops
+        table, user_column, author_column = self._columns()
+        created = self._execute(
+            f"{ops.insert_statement(ignore_conflicts=True)} {table} "
+            f"({user_column}, {author_column}) VALUES (%s, %s) "
+            f"{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}",
+            [user.pk, author.pk],
+        ) > 0
+        if created:
+            signals.post_save.send(
+                sender=self.model,
+                instance=self.model(user=user, author=author),
+                created=True,
+                update_fields=None,
+                raw=False,
+                using=self.db,
+            )
+        return created
+
+    def unfollow(self, user, author):
+        """Отписывает ``user`` от ``author``; True, если подписка была."""
+        table, user_column, author_column = self._columns()
+        deleted = self._execute(
+            f"DELETE FROM {table} "
+            f"WHERE {user_column} = %s AND {author_column} = %s",
+            [user.pk, author.pk],
+        ) > 0
+        if deleted:
+            signals.post_delete.send(
+                sender=self.model,
+                instance=self.model(user=user, author=author),
+                using=self.db,
+            )
+        return deleted
+
+    def followed_ids(self, user, authors):
+        """Множество id авторов из ``authors``, на которых подписан user."""
+        if not user.is_authenticated:
+            return set()
+        return set(
+            self.filter(user=user, author__in=authors)
+            .values_list("author_id", flat=True)
+        )
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -90,3 +296,47 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="following"
     )
+
+    objects = FollowManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="unique_follow"
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F("author")),
+                name="prevent_self_follow"
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, записанный при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries"
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_post"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"]),
+            models.Index(fields=["user", "author"]),
+        ]
@@ -0,0 +1,172 @@
+import base64
+import binascii
+import heapq
+import json
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+
+class CursorPaginator(Paginator):
+    """Постраничная навигация по ключу (keyset) вместо OFFSET.
+
+    Записи сортируются по убыванию полей ``ordering``, а соседние
+    страницы выбираются условием «ключ меньше/больше ключа крайней
+    записи», поэтому N-я страница стоит столько же, сколько первая.
+    Ссылки ``?page=N`` по-прежнему работают через OFFSET.
+
+    Если число записей уже известно (денормализованный счётчик),
+    его передают в ``count``, и COUNT(*) не выполняется вовсе.
+
+    В ``merge`` можно передать дополнительные ленты ``(queryset,
+    ordering)`` с ключом того же смысла: каждая читается своим
+    поиском по индексу, а результаты сливаются k-way merge по ключу.
+    Записи с одинаковым ключом выводятся один раз.
+    """
+
+    def __init__(self, object_list, per_page, ordering=("pub_date", "id"),
+                 count=None, merge=(), **kwargs):
+        self.ordering = tuple(ordering)
+        self.sources = [
+            (
+                queryset.order_by(*(f"-{field}" for field in fields)),
+                tuple(fields),
+            )
+            for queryset, fields in [(object_list, ordering), *merge]
+        ]
+        super().__init__(self.sources[0][0], per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+    def get_page(self, number=None, after=None, before=None):
+        """Страница по курсору ``after``/``before`` или по номеру.
+
+        Битый курсор не считается ошибкой: отдаётся страница по номеру,
+        как это делает ``Paginator.get_page``.
+        """
+        cursor = self.decode_cursor(after or before)
+        if cursor is None:
+            return self._page_by_number(number)
+        number, key = cursor
+        if after:
+            rows = self._fetch(self.per_page + 1, key=key, lookup="lt")
+            return self._build_page(
+                rows, max(number, 2), len(rows) > self.per_page
+            )
+        rows = self._fetch(self.per_page + 1, key=key, lookup="gt")
+        if len(rows) <= self.per_page:
+            return self._page_by_number(1)
+        return self._build_page(rows[:self.per_page][::-1], max(number, 2))
+
+    def _page_by_number(self, number):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        rows = self._rows_of_page(number)
+        if not rows and number > 1:
+            # Старая ссылка за концом ленты: только здесь нужен COUNT(*).
+            last = self.num_pages
+            number = last if last < number else 1
+            rows = self._rows_of_page(number)
+        if not rows and number > 1:
+            # Переданный в ``count`` счётчик больше, чем записей в ленте.
+            number = 1
+            rows = self._rows_of_page(number)
+        return self._build_page(rows, number, len(rows) > self.per_page)
+
+    def _rows_of_page(self, number):
+        bottom = (number - 1) * self.per_page
+        return self._fetch(self.per_page + 1, offset=bottom)
+
+    def _fetch(self, limit, key=None, lookup="lt", offset=0):
+        """Пары ``(ключ, запись)`` за ключом ``key`` в порядке обхода.
+
+        ``lookup="gt"`` читает ленту в обратную сторону (к новым).
+        """
+        streams = []
+        for queryset, fields in self.sources:
+            if lookup == "gt":
+                queryset = queryset.reverse()
+            if key is not None:
+                queryset = queryset.filter(self._seek(fields, key, lookup))
+            if len(self.sources) == 1:
+                queryset = queryset[offset:offset + limit]
+            else:
+                queryset = queryset[:offset + limit]
+            streams.append([
+                (tuple(getattr(row, field) for field in fields), row)
+                for row in queryset
+            ])
+        if len(streams) == 1:
+            return streams[0]
+        merged = heapq.merge(
+            *streams, key=itemgetter(0), reverse=(lookup == "lt")
+        )
+        unique = (next(group) for _, group in groupby(merged, itemgetter(0)))
+        return list(islice(unique, offset, offset + limit))
+
+    def _build_page(self, rows, number, has_next=True):
+        rows = rows[:self.per_page]
+        page = Page([row for _, row in rows], number, self)
+        page.previous_cursor = None
+        page.next_cursor = None
+        if rows and number > 1:
+            page.previous_cursor = self.encode_cursor(number - 1, rows[0][0])
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor(number + 1, rows[-1][0])
+        return page
+
+    @staticmethod
+    def _seek(fields, key, lookup):
+        """Условие «кортеж fields меньше (lt) или больше (gt) key»."""
+        condition = Q()
+        for index, field in enumerate(fields):
+            equal = dict(zip(fields[:index], key[:index]))
+            equal[f"{field}__{lookup}"] = key[index]
+            condition |= Q(**equal)
+        return condition
+
+    def encode_cursor(self, number, key):
+        values = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in key
+        ]
+        raw = json.dumps([number] + values).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, token):
+        """Возвращает ``(number, key)`` или ``None`` для битого курсора."""
+        if not token:
+            return None
+        opts = self.object_list.model._meta
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            number, *values = json.loads(raw.decode())
+            number = int(number)
+            key = [
+                opts.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (ValueError, TypeError, OverflowError, binascii.Error,
+                ValidationError):
+            return None
+        if len(values) != len(self.ordering) or None in key:
+            return None
+        return number, key
+
+
+def paginate(request, object_list, per_page=POSTS_PER_PAGE, **kwargs):
+    """Страница ленты по параметрам ``page``/``after``/``before`` запроса."""
+    paginator = CursorPaginator(object_list, per_page, **kwargs)
+    return paginator.get_page(
+        request.GET.get("page"),
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
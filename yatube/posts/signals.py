@@ -0,0 +1,274 @@
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from . import generations, lookups, timeline
+from .models import (
+    AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+)
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+
+def change_counters(author_id, group_id, delta):
+    """Сдвигает счётчики автора и группы одним UPDATE на каждый."""
+    if author_id is not None:
+        if delta > 0:
+            AuthorStats.objects.get_or_create(author_id=author_id)
+        stats = AuthorStats.objects.filter(author_id=author_id)
+        if delta < 0:
+            stats = stats.filter(posts_count__gte=-delta)
+        stats.update(posts_count=F("posts_count") + delta)
+    if group_id is not None:
+        groups = Group.objects.filter(pk=group_id)
+        if delta < 0:
+            groups = groups.filter(posts_count__gte=-delta)
+        groups.update(posts_count=F("posts_count") + delta)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_owners(sender, instance, raw=False, **kwargs):
+    instance._saved_owners = None
+    instance._saved_image = None
+    if instance.pk is not None and not raw:
+        saved = Post.objects.filter(pk=instance.pk).values_list(
+            "author_id", "group_id", "image"
+        ).first()
+        if saved is not None:
+            instance._saved_owners = saved[:2]
+            instance._saved_image = saved[2]
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    owners = (instance.author_id, instance.group_id)
+    saved = getattr(instance, "_saved_owners", None)
+    if created or saved is None:
+        change_counters(*owners, 1)
+    elif saved != owners:
+        change_counters(*saved, -1)
+        change_counters(*owners, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_counters(instance.author_id, instance.group_id, -1)
+
+
+def delete_unused_image(name):
+    """Удаляет файл картинки и его миниатюры, если на него больше не ссылается
+    ни один пост: одинаковые картинки хранятся одним файлом."""
+    def is_used():
+        return Post.objects.filter(image=name).exists()
+
+    if not name or is_used():
+        return
+    storage = Post._meta.get_field("image").storage
+    try:
+        if storage.delete_unused(name, is_used):
+            default.kvstore.delete(ImageFile(name, storage))
+    except (OSError, SuspiciousFileOperation):
+        # Пост уже удалён; оставшийся файл не повод для ошибки.
+        logger.warning(
+            "Картинка %s не удалена", name, exc_info=True
+        )
+
+
+def release_image(name):
+    if name:
+        transaction.on_commit(lambda: delete_unused_image(name))
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    saved = getattr(instance, "_saved_image", None)
+    if not raw and saved and saved != instance.image.name:
+        release_image(saved)
+
+
+@receiver(post_save, sender=Post)
+def restore_reused_image(sender, instance, raw=False, **kwargs):
+    # Файл, взятый у другого поста, могли удалить до фиксации этого.
+    name = instance.image.name
+    storage = Post._meta.get_field("image").storage
+    content = storage.take_reused(name) if name else None
+    if not raw and content is not None:
+        transaction.on_commit(lambda: storage.restore(name, content))
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.change_followers(instance.author_id, 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.change_followers(instance.author_id, -1)
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+def post_scopes(post, followers):
+    """Все ленты, в которых показан пост."""
+    scopes = {"index", f"author:{post.author.username}"}
+    if post.group_id is not None:
+        scopes.add(f"group:{post.group.slug}")
+    return scopes | timeline.follow_scopes(post.author_id, followers)
+
+
+def owner_scopes(author_id, group_id):
+    """Ленты прежних автора и группы поста, загружаемые по id."""
+    usernames = User.objects.filter(pk=author_id).values_list(
+        "username", flat=True
+    )
+    slugs = Group.objects.filter(pk=group_id).values_list("slug", flat=True)
+    return (
+        {f"author:{username}" for username in usernames}
+        | {f"group:{slug}" for slug in slugs}
+        | timeline.follow_scopes(author_id, timeline.followers_of(author_id))
+    )
+
+
+@receiver(post_save, sender=Post)
+def update_post_feeds(sender, instance, created, raw=False, **kwargs):
+    """Раскладывает пост по лентам подписчиков и сдвигает поколения."""
+    if raw:
+        return
+    followers = timeline.followers_of(instance.author_id)
+    scopes = post_scopes(instance, followers)
+    saved = getattr(instance, "_saved_owners", None)
+    if saved is not None and saved != (instance.author_id, instance.group_id):
+        scopes |= owner_scopes(*saved)
+    if created or saved is None or saved[0] != instance.author_id:
+        if not created and saved is not None:
+            TimelineEntry.objects.filter(post=instance).delete()
+        if followers is not None:
+            timeline.push_post(instance, followers)
+    generations.bump(*scopes)
+
+
+@receiver(post_delete, sender=Post)
+def bump_deleted_post_feeds(sender, instance, **kwargs):
+    followers = timeline.followers_of(instance.author_id)
+    generations.bump(*post_scopes(instance, followers))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        generations.bump(f"post:{instance.post_id}")
+
+
+def saved_values(sender, instance, *fields):
+    """Значения полей записи, какими они были до сохранения."""
+    if instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def shown_in_feeds(posts):
+    """Все ленты, в которых показаны посты ``posts``."""
+    scopes = set()
+    authors = set()
+    for author_id, username, slug in posts.values_list(
+        "author_id", "author__username", "group__slug"
+    ).distinct():
+        scopes |= {"index", f"author:{username}"}
+        if slug is not None:
+            scopes.add(f"group:{slug}")
+        authors.add(author_id)
+    for author_id in authors:
+        scopes |= timeline.follow_scopes(
+            author_id, timeline.followers_of(author_id)
+        )
+    return scopes
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, raw=False, **kwargs):
+    saved = None if raw else saved_values(sender, instance, "slug")
+    instance._saved_slug = saved and saved[0]
+
+
+@receiver(post_save, sender=Group)
+def bump_group_feed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    scopes = {f"group:{instance.slug}"}
+    saved = getattr(instance, "_saved_slug", None)
+    if saved and saved != instance.slug:
+        # Карточки постов группы во всех лентах ссылаются на прежний
+        # адрес, а его страницы больше не существует.
+        scopes.add(f"group:{saved}")
+        scopes |= shown_in_feeds(instance.posts.all())
+    generations.bump(*scopes)
+
+
+# Поля автора, которые показаны в карточках его постов.
+AUTHOR_NAMES = ("username", "first_name", "last_name")
+
+
+@receiver(pre_save, sender=User)
+def remember_author_names(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    instance._saved_names = None
+    if raw:
+        return
+    if update_fields is None or set(update_fields) & set(AUTHOR_NAMES):
+        instance._saved_names = saved_values(sender, instance, *AUTHOR_NAMES)
+
+
+@receiver(post_save, sender=User)
+def bump_renamed_author_feeds(sender, instance, raw=False, **kwargs):
+    saved = getattr(instance, "_saved_names", None)
+    names = tuple(getattr(instance, field) for field in AUTHOR_NAMES)
+    if raw or saved is None or saved == names:
+        return
+    generations.bump(
+        f"author:{saved[0]}",
+        f"author:{instance.username}",
+        *shown_in_feeds(instance.posts.all()),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_feeds(sender, instance, raw=False, **kwargs):
+    # На странице автора есть кнопка подписки.
+    if not raw:
+        generations.bump(
+            f"author:{instance.author.username}",
+            f"follow:{instance.user_id}",
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_lookups(sender, raw=False, **kwargs):
+    if not raw:
+        lookups.groups.invalidate()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_lookups(sender, raw=False, update_fields=None, **kwargs):
+    # Вход обновляет только last_login, которого в кэше нет.
+    if not raw and update_fields != frozenset(["last_login"]):
+        lookups.users.invalidate()
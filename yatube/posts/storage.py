@@ -0,0 +1,88 @@
+import hashlib
+import os
+import posixpath
+import threading
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы с именем по SHA-256 содержимого: одинаковые байты хранятся
+    один раз.
+
+    ``posts/a.gif`` сохраняется как ``posts/<2 символа>/<хэш>.gif``; если такой
+    файл уже есть, он не перезаписывается, а имя просто возвращается. Поэтому и
+    миниатюры sorl, которые называются по имени оригинала, у одинаковых
+    картинок общие. Удалять файл можно, только когда на него никто не
+    ссылается: ``delete_unused`` вместе с ``restore`` делают это без гонки с
+    загрузкой того же файла.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+
+    def _reused(self):
+        if not hasattr(self._local, "files"):
+            self._local.files = {}
+        return self._local.files
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension
+        )
+        if self.exists(name):
+            self._reused()[name] = content
+            return name
+        return super().save(name, content, max_length)
+
+    def take_reused(self, name):
+        """Содержимое, для которого ``save`` взял уже существующий файл
+        ``name``, или ``None``.
+
+        Забирать его нужно и когда запись не сохранилась, иначе оно
+        останется в потоке (см. ``Post.save``).
+        """
+        return self._reused().pop(name, None)
+
+    def restore(self, name, content):
+        """Записывает ``content`` под именем ``name``, если файла нет: его
+        могли удалить как ненужный между ``save`` и фиксацией поста."""
+        if self.exists(name):
+            return
+        content.seek(0)
+        saved = super().save(name, content)
+        if saved != name:
+            # Файл успели восстановить.
+            self.delete(saved)
+
+    def delete_unused(self, name, is_used):
+        """Удаляет файл, если ``is_used()`` ложно; ``True``, если удалил.
+
+        Файл сначала переносится под временное имя, и только потом проверяется
+        ``is_used``. Загрузка, нашедшая файл до переноса, после фиксации поста
+        его не найдёт и запишет заново (``restore``), а если зафиксировала пост
+        раньше проверки, файл вернётся на место.
+        """
+        path = self.path(name)
+        trash = f"{path}.{uuid.uuid4().hex}.deleted"
+        try:
+            os.replace(path, trash)
+        except FileNotFoundError:
+            return False
+        if is_used():
+            os.replace(trash, path)
+            return False
+        os.remove(trash)
+        return True
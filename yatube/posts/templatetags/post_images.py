@@ -0,0 +1,19 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts, name):
+    """Находит готовые миниатюры всех постов страницы одним запросом."""
+    thumbnails.prefetch_thumbnails(posts, name)
+    return ""
+
+
+@register.inclusion_tag("includes/post_picture.html")
+def post_picture(post, name):
+    """Картинка поста с вариантами для srcset: в запросе картинки не
+    обрабатываются, их заранее готовит пул миниатюр."""
+    return thumbnails.picture(post, name)
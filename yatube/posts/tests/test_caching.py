@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from ..caching import cache_view, view_cache_key
+from ..conditional import conditional
+
+
+class CacheViewTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.version = 1
+        self.request = RequestFactory().get("/feed/")
+
+    def view(self, request):
+        self.calls += 1
+        return HttpResponse(f"ответ {self.calls}")
+
+    def cached(self, **kwargs):
+        kwargs.setdefault("version", lambda request: self.version)
+        return cache_view(60, **kwargs)(self.view)
+
+    def lock(self):
+        cache.add(f"{view_cache_key(self.request, self.view)}.lock", True)
+
+    def test_cached_response(self):
+        """Повторный запрос отдаётся из кэша"""
+        view = self.cached()
+        view(self.request)
+        self.assertEqual(view(self.request).content.decode(), "ответ 1")
+        self.assertEqual(self.calls, 1)
+
+    def test_new_version_recomputed(self):
+        """Смена версии приводит к пересчёту"""
+        view = self.cached()
+        view(self.request)
+        self.version = 2
+        self.assertEqual(view(self.request).content.decode(), "ответ 2")
+
+    def test_stale_while_locked(self):
+        """Пока запись пересчитывает другой запрос, отдаётся устаревшая"""
+        view = self.cached()
+        view(self.request)
+        self.version = 2
+        self.lock()
+        self.assertEqual(view(self.request).content.decode(), "ответ 1")
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_keeps_own_etag(self):
+        """Устаревший ответ идёт с ETag своей версии, а не текущей"""
+        view = conditional(
+            lambda request: ((self.version,), None)
+        )(self.cached())
+        etag = view(self.request)["ETag"]
+        self.version = 2
+        self.lock()
+        response = view(self.request)
+        self.assertEqual(response.content.decode(), "ответ 1")
+        self.assertEqual(response["ETag"], etag)
+        self.assertIn("no-cache", response["Cache-Control"])
+        revalidated = RequestFactory().get("/feed/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(view(revalidated).status_code, 304)
+        cache.clear()
+        response = view(revalidated)
+        self.assertEqual(response.content.decode(), "ответ 2")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_cold_miss_waits_for_lock(self):
+        """Без записи запрос ждёт блокировку и считает сам по таймауту"""
+        view = self.cached(lock_timeout=0.2)
+        self.lock()
+        self.assertEqual(view(self.request).content.decode(), "ответ 1")
+        self.assertFalse(cache.has_key(
+            view_cache_key(self.request, self.view)
+        ))
+
+    def test_early_refresh(self):
+        """С ростом beta запись обновляется до истечения"""
+        view = self.cached(beta=10 ** 9)
+        view(self.request)
+        with mock.patch("posts.caching.random.random", return_value=0.5):
+            self.assertEqual(view(self.request).content.decode(), "ответ 2")
+
+    def test_unsafe_methods_not_cached(self):
+        """POST-запросы не кэшируются"""
+        view = self.cached()
+        request = RequestFactory().post("/feed/")
+        view(request)
+        view(request)
+        self.assertEqual(self.calls, 2)
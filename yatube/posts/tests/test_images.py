@@ -0,0 +1,139 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def make_upload(name, size, image_format, mode="RGB", exif=None):
+    content = BytesIO()
+    options = {"exif": exif} if exif is not None else {}
+    Image.new(mode, size, "red").save(content, image_format, **options)
+    return SimpleUploadedFile(
+        name, content.getvalue(), content_type=f"image/{image_format}"
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIDE=200)
+class ImageIngestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, upload):
+        response = self.client.post(
+            reverse("posts:post_create"), {"text": "Пост", "image": upload}
+        )
+        return response, Post.objects.filter(text="Пост").first()
+
+    def test_large_image_reduced(self):
+        """Большая картинка уменьшается при загрузке, размеры в модели"""
+        _, post = self.create(make_upload("photo.png", (800, 600), "PNG"))
+        self.assertEqual((post.image_width, post.image_height), (200, 150))
+        self.assertTrue(post.image.name.endswith(".jpg"))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (200, 150))
+
+    def test_small_image_kept(self):
+        """Небольшая картинка хранится без перекодирования"""
+        upload = make_upload("small.png", (20, 10), "PNG", mode="RGBA")
+        _, post = self.create(upload)
+        self.assertTrue(post.image.name.endswith(".png"))
+        self.assertEqual((post.image_width, post.image_height), (20, 10))
+        with open(post.image.path, "rb") as stored:
+            upload.seek(0)
+            self.assertEqual(stored.read(), upload.read())
+
+    def test_exif_rotation_applied(self):
+        """Поворот из EXIF применяется к сохранённой картинке"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        _, post = self.create(
+            make_upload("rotated.jpg", (40, 20), "JPEG", exif=exif.tobytes())
+        )
+        self.assertEqual((post.image_width, post.image_height), (20, 40))
+
+    @override_settings(POST_IMAGE_MAX_FULL_PIXELS=100000)
+    def test_too_many_pixels_rejected(self):
+        """Не JPEG больше предела полного декодирования отклоняется"""
+        response, post = self.create(
+            make_upload("huge.png", (400, 400), "PNG")
+        )
+        self.assertIsNone(post)
+        self.assertFormError(
+            response, "form", "image",
+            "Картинка слишком большая: не больше 0.1 Мп.",
+        )
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=10000)
+    def test_jpeg_limit_after_draft(self):
+        """JPEG больше предела и после уменьшенного декодирования
+        отклоняется"""
+        response, post = self.create(
+            make_upload("huge.jpg", (1600, 1600), "JPEG")
+        )
+        self.assertIsNone(post)
+        self.assertFormError(
+            response, "form", "image",
+            "Картинка слишком большая: не больше 0.01 Мп.",
+        )
+
+    def test_truncated_image_rejected(self):
+        """Обрезанный файл даёт ошибку формы, а не 500"""
+        upload = make_upload("broken.jpg", (800, 600), "JPEG")
+        content = upload.read()
+        upload = SimpleUploadedFile(
+            "broken.jpg", content[:len(content) // 2],
+            content_type="image/jpeg",
+        )
+        response, post = self.create(upload)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(post)
+        self.assertFormError(
+            response, "form", "image",
+            "Картинка повреждена или не поддерживается.",
+        )
+
+    def test_jpeg_decoded_reduced(self):
+        """JPEG декодируется сразу в уменьшенном масштабе"""
+        upload = make_upload("big.jpg", (1600, 1200), "JPEG")
+        with override_settings(POST_IMAGE_MAX_PIXELS=100000):
+            _, post = self.create(upload)
+        self.assertEqual((post.image_width, post.image_height), (200, 150))
+
+    def test_placeholder_reset_on_replace(self):
+        """Новая картинка сбрасывает заглушку старой"""
+        _, post = self.create(make_upload("first.png", (20, 10), "PNG"))
+        Post.objects.filter(pk=post.pk).update(image_placeholder="data:")
+        self.client.post(
+            reverse("posts:post_edit", kwargs={"post_id": post.pk}),
+            {
+                "text": "Пост",
+                "image": make_upload("second.gif", (5, 5), "GIF"),
+            },
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.image_placeholder, "")
+        self.assertEqual((post.image_width, post.image_height), (5, 5))
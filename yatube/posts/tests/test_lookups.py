@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+
+from .. import generations
+from ..lookups import LookupCache, groups, users
+from ..models import Group
+
+User = get_user_model()
+
+
+class LookupCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title="Тестовая группа", slug="test-slug", description="О группе"
+        )
+        cls.user = User.objects.create_user(username="auth")
+
+    def setUp(self):
+        cache.clear()
+        groups.invalidate()
+        users.invalidate()
+
+    def test_hit_without_queries(self):
+        """Повторный поиск группы и автора не ходит в базу"""
+        groups.get_or_404(self.group.slug)
+        users.get_or_404(self.user.username)
+        hits, misses = groups.hits, groups.misses
+        with self.assertNumQueries(0):
+            group = groups.get_or_404(self.group.slug)
+            author = users.get_or_404(self.user.username)
+        self.assertEqual(group, self.group)
+        self.assertEqual(group.title, self.group.title)
+        self.assertEqual(author, self.user)
+        self.assertEqual((groups.hits, groups.misses), (hits + 1, misses))
+        self.assertIsNot(group, groups.get_or_404(self.group.slug))
+
+    def test_invalidated_on_save_and_delete(self):
+        """Сохранение и удаление записи сбрасывают кэш"""
+        groups.get_or_404(self.group.slug)
+        self.group.slug = "new-slug"
+        self.group.save()
+        self.assertRaises(Http404, groups.get_or_404, "test-slug")
+        self.assertEqual(groups.get_or_404("new-slug").pk, self.group.pk)
+        self.group.delete()
+        self.assertRaises(Http404, groups.get_or_404, "new-slug")
+
+    def test_login_keeps_users(self):
+        """Вход пользователя не сбрасывает кэш авторов"""
+        users.get_or_404(self.user.username)
+        self.client.force_login(self.user)
+        with self.assertNumQueries(0):
+            users.get_or_404(self.user.username)
+
+    def test_hit_without_cache(self):
+        """Попадание сверяет поколение с общим кэшем не чаще интервала"""
+        lookup = LookupCache(
+            Group.objects.all(), "slug", ("id", "slug"), "lookup:test",
+            check_interval=60,
+        )
+        lookup.get_or_404(self.group.slug)
+        with mock.patch.object(generations, "current") as current:
+            lookup.get_or_404(self.group.slug)
+        current.assert_not_called()
+
+    def test_changes_from_other_processes(self):
+        """Чужое изменение видно после интервала проверки"""
+        lookup = LookupCache(
+            Group.objects.all(), "slug", ("id", "slug"), "lookup:test",
+            check_interval=0,
+        )
+        lookup.get_or_404(self.group.slug)
+        Group.objects.filter(pk=self.group.pk).update(slug="moved")
+        generations.bump("lookup:test")
+        self.assertRaises(Http404, lookup.get_or_404, "test-slug")
+
+    def test_bounded(self):
+        """Старые записи вытесняются по LRU"""
+        lookup = LookupCache(
+            Group.objects.all(), "slug", ("id", "slug"), "lookup:test",
+            maxsize=1,
+        )
+        other = Group.objects.create(title="Другая", slug="other")
+        lookup.get_or_404(self.group.slug)
+        lookup.get_or_404(other.slug)
+        with self.assertNumQueries(1):
+            lookup.get_or_404(self.group.slug)
@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Group, Post
 
 User = get_user_model()
 
@@ -36,3 +39,56 @@ class GroupModelTest(TestCase):
         """Проверяем, что у моделей корректно работает __str__."""
         group = self.group
         self.assertEqual(str(group), group.title)
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.group_2 = Group.objects.create(
+            title="Тестовая группа 2",
+            slug="test-slug-2",
+            description="Тестовое описание",
+        )
+
+    def assertCounters(self, author_count, group_count, group_2_count):
+        self.assertEqual(
+            AuthorStats.objects.for_author(self.user).posts_count,
+            author_count
+        )
+        self.group.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.group.posts_count, group_count)
+        self.assertEqual(self.group_2.posts_count, group_2_count)
+
+    def test_counters_follow_posts(self):
+        """Счётчики меняются при создании, переносе и удалении поста."""
+        post = Post.objects.create(
+            author=self.user, text="Пост", group=self.group
+        )
+        Post.objects.create(author=self.user, text="Пост без группы")
+        self.assertCounters(2, 1, 0)
+        post.group = self.group_2
+        post.save()
+        self.assertCounters(2, 0, 1)
+        post.text = "Новый текст"
+        post.save()
+        self.assertCounters(2, 0, 1)
+        post.delete()
+        self.assertCounters(1, 0, 0)
+
+    def test_rebuild_counters(self):
+        """Команда rebuild_counters пересчитывает счётчики с нуля."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text="Пост", group=self.group)
+            for _ in range(3)
+        )
+        self.assertCounters(0, 0, 0)
+        call_command("rebuild_counters", stdout=StringIO())
+        self.assertCounters(3, 3, 0)
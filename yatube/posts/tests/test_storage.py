@@ -0,0 +1,154 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from .. import signals, thumbnails
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def upload(name, color):
+    content = BytesIO()
+    Image.new("RGB", (4, 2), color).save(content, "PNG")
+    return SimpleUploadedFile(
+        name, content.getvalue(), content_type="image/png"
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch.object(
+    signals.transaction, "on_commit", side_effect=lambda callback: callback()
+)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create(self, image):
+        return Post.objects.create(author=self.user, text="Пост", image=image)
+
+    def test_same_bytes_stored_once(self, on_commit):
+        """Одинаковые картинки — один файл с именем по содержимому"""
+        first = self.create(upload("first.png", "red"))
+        second = self.create(upload("second.png", "red"))
+        other = self.create(upload("first.png", "blue"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(
+            first.image.name, r"^posts/[0-9a-f]{2}/[0-9a-f]{64}\.png$"
+        )
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)
+        ])
+
+    def test_thumbnails_shared(self, on_commit):
+        """Миниатюры одинаковой картинки создаются один раз"""
+        first = self.create(upload("first.png", "red"))
+        thumbnails.pregenerate(first.pk)
+        second = self.create(upload("second.png", "red"))
+        with mock.patch.object(
+            default.engine, "get_image",
+            side_effect=AssertionError("повторная обработка"),
+        ):
+            thumbnails.pregenerate(second.pk)
+        self.assertTrue(thumbnails.ready_variants(second, "card"))
+
+    def test_deleted_with_last_reference(self, on_commit):
+        """Файл и миниатюры удаляются вместе с последним постом"""
+        first = self.create(upload("first.png", "green"))
+        second = self.create(upload("second.png", "green"))
+        thumbnails.pregenerate(first.pk)
+        _, card = thumbnails.ready_variants(first, "card")[0]
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(card.exists())
+        self.assertIsNone(default.kvstore.get(card))
+
+    def test_replaced_image_released(self, on_commit):
+        """Заменённая картинка без других ссылок удаляется"""
+        post = self.create(upload("first.png", "yellow"))
+        path = post.image.path
+        with mock.patch.object(thumbnails, "schedule"):
+            self.client.post(
+                reverse("posts:post_edit", kwargs={"post_id": post.pk}),
+                {"text": "Пост", "image": upload("second.png", "black")},
+            )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.path, path)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_upload_restores_concurrently_deleted(self, on_commit):
+        """Файл, удалённый после проверки в save, загрузка пишет заново"""
+        first = self.create(upload("first.png", "purple"))
+        storage = first.image.storage
+        exists = storage.exists
+        deleted = []
+
+        def exists_then_deleted(name):
+            # Другой процесс удаляет файл сразу после проверки.
+            found = exists(name)
+            if found and not deleted:
+                deleted.append(name)
+                os.remove(storage.path(name))
+            return found
+
+        with mock.patch.object(
+            storage, "exists", side_effect=exists_then_deleted
+        ):
+            second = self.create(upload("second.png", "purple"))
+        self.assertEqual(deleted, [first.image.name])
+        self.assertTrue(os.path.exists(second.image.path))
+
+    def test_failed_save_releases_upload(self, on_commit):
+        """Неудачное сохранение не оставляет загрузку в потоке"""
+        first = self.create(upload("first.png", "teal"))
+        storage = first.image.storage
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Post.objects.create(
+                author=None, text="Пост", image=upload("second.png", "teal")
+            )
+        self.assertIsNone(storage.take_reused(first.image.name))
+
+    def test_delete_checks_after_moving_file(self, on_commit):
+        """Ссылку проверяют, когда файла под именем уже нет"""
+        post = self.create(upload("first.png", "orange"))
+        storage = post.image.storage
+        seen = []
+
+        def is_used():
+            seen.append(os.path.exists(post.image.path))
+            return True
+
+        self.assertFalse(storage.delete_unused(post.image.name, is_used))
+        self.assertEqual(seen, [False])
+        self.assertTrue(os.path.exists(post.image.path))
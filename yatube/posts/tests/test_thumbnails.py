@@ -0,0 +1,280 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .. import generations, thumbnails
+from ..kvstore import KVStore, index_path
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def upload(name="small.gif", color=0):
+    # Одинаковые байты хранятся одним файлом с общими миниатюрами.
+    content = BytesIO()
+    Image.new("RGB", (2, 1), (color, 0, 0)).save(content, "GIF")
+    return SimpleUploadedFile(
+        name, content.getvalue(), content_type="image/gif"
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="auth")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+        self.post = Post.objects.create(
+            author=self.user, text="Пост", image=upload()
+        )
+        self.urls = (
+            reverse("posts:index"),
+            reverse("posts:post_detail", kwargs={"post_id": self.post.pk}),
+        )
+
+    def test_requests_never_resize(self):
+        """Пока миниатюры нет, страницы показывают оригинал без Pillow"""
+        with mock.patch.object(
+            default.engine, "get_image",
+            side_effect=AssertionError("обработка в запросе"),
+        ):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    self.assertContains(
+                        Client().get(url), self.post.image.url
+                    )
+        self.assertEqual(thumbnails.ready_variants(self.post, "card"), [])
+
+    def test_pregenerated_thumbnails_shown(self):
+        """После фоновой обработки страницы показывают миниатюры"""
+        for url in self.urls:
+            Client().get(url)
+        thumbnails.pregenerate(self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        for url, name in zip(self.urls, ("card", "detail")):
+            with self.subTest(url=url):
+                ready = thumbnails.ready_variants(post, name)
+                self.assertEqual(len(ready), len(thumbnails.variants(name)))
+                response = Client().get(url)
+                for _, thumbnail in ready:
+                    self.assertContains(
+                        response, f"{thumbnail.url} {thumbnail.width}w"
+                    )
+                self.assertContains(response, 'loading="lazy"')
+                self.assertNotContains(response, self.post.image.url)
+
+    def test_placeholder_inlined(self):
+        """Заглушка готовится в фоне и вставляется в карточку"""
+        thumbnails.pregenerate(self.post.pk)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertTrue(
+            post.image_placeholder.startswith("data:image/png;base64,")
+        )
+        self.assertLess(len(post.image_placeholder), 300)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    Client().get(url), post.image_placeholder
+                )
+
+    def test_picture_sources(self):
+        """WebP идёт отдельным source, JPEG — в img с размерами"""
+        def variant(image_format, width):
+            extension = image_format.lower()
+            return image_format, mock.Mock(
+                url=f"/media/{width}.{extension}", width=width,
+                height=width // 3,
+            )
+
+        ready = [
+            variant("WEBP", 320), variant("WEBP", 960),
+            variant("JPEG", 320), variant("JPEG", 960),
+        ]
+        with mock.patch.object(
+            thumbnails, "ready_variants", return_value=ready
+        ):
+            picture = thumbnails.picture(self.post, "card")
+        self.assertEqual(picture["sources"], [
+            ("image/webp", "/media/320.webp 320w, /media/960.webp 960w"),
+        ])
+        self.assertEqual(
+            picture["srcset"], "/media/320.jpeg 320w, /media/960.jpeg 960w"
+        )
+        self.assertEqual(
+            (picture["src"], picture["width"], picture["height"]),
+            ("/media/960.jpeg", 960, 320),
+        )
+
+    def test_feed_page_one_lookup(self):
+        """Миниатюры всей страницы ленты ищутся одним запросом"""
+        for number in range(3):
+            post = Post.objects.create(
+                author=self.user, text=f"Пост {number}",
+                image=upload(f"feed{number}.gif", color=number + 1),
+            )
+            thumbnails.pregenerate(post.pk)
+        posts = list(Post.objects.all())
+        with mock.patch.object(
+            default.kvstore, "_get_raw",
+            side_effect=AssertionError("поштучный поиск"),
+        ), mock.patch.object(
+            default.kvstore, "get_many", wraps=default.kvstore.get_many
+        ) as get_many:
+            thumbnails.prefetch_thumbnails(posts, "card")
+            found = [
+                thumbnails.ready_variants(post, "card") for post in posts
+            ]
+        get_many.assert_called_once()
+        self.assertEqual(sum(bool(ready) for ready in found), 3)
+
+    def test_scheduled_on_upload(self):
+        """Создание поста и замена картинки ставят её в очередь"""
+        client = Client()
+        client.force_login(self.user)
+        pool = mock.Mock()
+        edit_url = reverse(
+            "posts:post_edit", kwargs={"post_id": self.post.pk}
+        )
+        on_commit = mock.patch.object(
+            thumbnails.transaction, "on_commit",
+            side_effect=lambda callback: callback(),
+        )
+        with mock.patch.object(thumbnails, "executor", return_value=pool):
+            with on_commit:
+                client.post(
+                    reverse("posts:post_create"),
+                    {"text": "Новый", "image": upload("new.gif")},
+                )
+                client.post(edit_url, {"text": "Текст изменён"})
+                client.post(
+                    edit_url, {"text": "Пост", "image": upload("other.gif")}
+                )
+        created = Post.objects.get(text="Новый")
+        self.assertEqual(
+            [args[1] for args, _ in pool.submit.call_args_list],
+            [created.pk, self.post.pk],
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BackfillCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="auth")
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f"Пост {number}",
+                image=upload(f"backfill{number}.gif", color=100 + number),
+            )
+            for number in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        default.kvstore.clear()
+
+    def backfill(self, *args):
+        out = StringIO()
+        call_command(
+            "backfill_thumbnails", "--workers", "1", *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_all_variants_generated(self):
+        """Команда готовит все варианты, повторный запуск их не трогает"""
+        output = self.backfill("--batch", "2")
+        self.assertIn("2/3 постов", output)
+        self.assertIn("обновлено постов 3", output)
+        for post in Post.objects.all():
+            for name in thumbnails.THUMBNAILS:
+                self.assertEqual(
+                    len(thumbnails.ready_variants(post, name)),
+                    len(thumbnails.variants(name)),
+                )
+        self.assertIn("обновлено постов 0", self.backfill())
+
+    def test_feeds_bumped_per_batch(self):
+        """Поколения лент сдвигаются раз на пачку, а не на каждый пост"""
+        with mock.patch.object(generations, "bump") as bump:
+            self.backfill("--batch", "2")
+        self.assertEqual(bump.call_count, 2)
+        for args, _ in bump.call_args_list:
+            self.assertIn("index", args)
+            self.assertIn(f"author:{self.user.username}", args)
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.assertGreater(post.updated, self.posts[0].updated)
+        self.assertTrue(post.image_placeholder)
+
+    def test_resume_after(self):
+        """С --after обрабатываются только следующие посты"""
+        first, *rest = self.posts
+        self.assertIn("обновлено постов 2", self.backfill(
+            "--after", str(first.pk)
+        ))
+        self.assertEqual(thumbnails.ready_variants(first, "card"), [])
+
+    def test_stale_thumbnails_deleted(self):
+        """Миниатюры прежних размеров удаляются вместе с файлами"""
+        post = self.posts[0]
+        stale = get_thumbnail(post.image, "100x100")
+        self.assertTrue(stale.exists())
+        self.assertIn("удалено лишних миниатюр 1", self.backfill())
+        self.assertFalse(stale.exists())
+        self.assertIsNone(default.kvstore.get(stale))
+        self.assertEqual(thumbnails.prune_stale(post.image), 0)
+
+
+class KVStoreTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.media_root = os.path.join(self.directory, "media")
+
+    def test_index_outside_media_root(self):
+        """Индекс лежит рядом с MEDIA_ROOT, а не в нём, и ищет пачкой"""
+        with override_settings(
+            MEDIA_ROOT=self.media_root, THUMBNAIL_KVSTORE_PATH=None
+        ):
+            path = index_path()
+            store = KVStore()
+            image = ImageFile("posts/small.gif")
+            image.set_size((2, 1))
+            store.set(image)
+            missing = ImageFile("posts/missing.gif")
+            found = store.get_many([image, missing])
+            self.assertEqual(list(found[0].size), [2, 1])
+            self.assertIsNone(found[1])
+            self.assertEqual(len(list(store._find_keys())), 1)
+            store.delete(image)
+            self.assertIsNone(store.get(image))
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(
+            os.path.abspath(path).startswith(self.media_root + os.sep)
+        )
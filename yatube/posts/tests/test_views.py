@@ -1,3 +1,4 @@
+import base64
 import shutil
 import tempfile
 
@@ -6,10 +7,16 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post
+from .. import generations
+from ..models import (
+    AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+)
+from ..paginators import COMMENTS_PER_PAGE
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -187,15 +194,192 @@ class PostViewsTests(TestCase):
         self.assertEqual(comment.text, form_data["text"])
         self.assertEqual(comment.author, self.user)
 
+    def test_comments_pages(self):
+        """Комментарии под постом подгружаются порциями"""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f"Коммент {n}")
+            for n in range(COMMENTS_PER_PAGE + 5)
+        )
+        response = self.guest_client.get(
+            reverse("posts:post_detail", kwargs={"post_id": self.post.id})
+        )
+        comments = response.context["comments"]
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        response = self.guest_client.get(
+            reverse("posts:post_comments", kwargs={"post_id": self.post.id}),
+            {"after": comments.next_cursor},
+        )
+        self.assertTemplateUsed(response, "includes/comments_list.html")
+        self.assertEqual(
+            list(response.context["comments"]),
+            list(self.post.comments.order_by("-created", "-id")
+                 [COMMENTS_PER_PAGE:])
+        )
+        self.assertIsNone(response.context["comments"].next_cursor)
+
     def test_cache(self):
         """Проверка  кэша"""
         response = self.guest_client.get(reverse("posts:index")).content
-        Post.objects.create(
-            text="Пост ",
-            author=self.user,
+        with self.assertNumQueries(0):
+            response_1 = self.guest_client.get(reverse("posts:index"))
+        self.assertEqual(response, response_1.content)
+        self.assertIn("public", response_1["Cache-Control"])
+
+    def test_conditional_get(self):
+        """Неизменившаяся страница отдаётся как 304 без рендеринга"""
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": self.user}),
+            reverse("posts:post_detail", kwargs={"post_id": self.post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)["ETag"]
+                with self.assertNumQueries(0 if url != urls[-1] else 1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertIn("public", response["Cache-Control"])
+        etags = [self.guest_client.get(url)["ETag"] for url in urls]
+        Post.objects.create(text="Пост", author=self.user, group=self.group)
+        Comment.objects.create(post=self.post, author=self.user, text="Ок")
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_post_etag_follows_author(self):
+        """После смены имени автора страница поста не отдаётся как 304"""
+        url = reverse("posts:post_detail", kwargs={"post_id": self.post.pk})
+        etag = self.guest_client.get(url)["ETag"]
+        user = User.objects.get(pk=self.user.pk)
+        user.username = "renamed"
+        user.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "renamed")
+
+    def test_conditional_get_private(self):
+        """Пользователю страницы не кэшируются браузером без проверки"""
+        url = reverse("posts:index")
+        response = self.authorized_client.get(url)
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertNotEqual(
+            response["ETag"], self.guest_client.get(url)["ETag"]
         )
-        response_1 = self.guest_client.get(reverse("posts:index")).content
-        self.assertEqual(response, response_1)
+
+    def test_cache_invalidated_by_signals(self):
+        """Изменения лент видны сразу, несмотря на кэш"""
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": self.user}),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        post = Post.objects.create(
+            text="Свежий пост", author=self.user, group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), post.text)
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.guest_client.get(url), post.text
+                )
+        url = reverse("posts:post_comments", kwargs={"post_id": self.post.pk})
+        self.guest_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text="Новый комментарий"
+        )
+        self.assertContains(self.guest_client.get(url), "Новый комментарий")
+
+    def test_renamed_feeds_not_served(self):
+        """Страницы прежних slug и имени не отдаются из кэша"""
+        urls = [
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": self.user}),
+        ]
+        for url in urls:
+            self.assertEqual(self.guest_client.get(url).status_code, 200)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = "renamed-group"
+        group.save()
+        user = User.objects.get(pk=self.user.pk)
+        user.username = "renamed"
+        user.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.guest_client.get(url).status_code, 404
+                )
+
+    def test_renamed_author_in_feeds(self):
+        """Новое имя автора сразу видно во всех лентах с его постами"""
+        follower = User.objects.create_user(username="follower")
+        Follow.objects.follow(follower, self.user)
+        follower_client = Client()
+        follower_client.force_login(follower)
+        feeds = [
+            (self.guest_client, reverse("posts:index")),
+            (
+                self.guest_client,
+                reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            ),
+            (follower_client, reverse("posts:follow_index")),
+        ]
+        for client, url in feeds:
+            client.get(url)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = "Лев"
+        user.save()
+        for client, url in feeds:
+            with self.subTest(url=url, field="first_name"):
+                self.assertContains(client.get(url), "Лев")
+        user.username = "renamed"
+        user.save()
+        profile = reverse("posts:profile", kwargs={"username": "renamed"})
+        for client, url in feeds:
+            with self.subTest(url=url, field="username"):
+                self.assertContains(client.get(url), f'href="{profile}"')
+
+    def test_renamed_group_in_feeds(self):
+        """Новый адрес группы сразу видно в ленте и на странице автора"""
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:profile", kwargs={"username": self.user}),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = "renamed-group"
+        group.save()
+        old = reverse("posts:group_list", kwargs={"slug": "test-slug"})
+        new = reverse("posts:group_list", kwargs={"slug": "renamed-group"})
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, f'href="{new}"')
+                self.assertNotContains(response, f'href="{old}"')
+
+    def test_post_card_cache(self):
+        """Карточки постов кэшируются отдельно и обновляются при правке"""
+        url = reverse("posts:index")
+        self.guest_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text="Без сигналов")
+        Post.objects.create(text="Новый пост", author=self.user)
+        response = self.guest_client.get(url)
+        self.assertContains(response, "Новый пост")
+        self.assertContains(response, self.post.text)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = "Исправленный текст"
+        post.save()
+        self.assertContains(self.guest_client.get(url), post.text)
 
     def test_cache_changes(self):
         response = self.guest_client.get(reverse("posts:index")).content
@@ -224,6 +408,9 @@ class PaginatorTest(TestCase):
             description="Что-то о группе",
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_paginator_on_pages(self):
         """Проверяем, что первые страницы возвращают 10 постов, вторые 8"""
         Post.objects.bulk_create(
@@ -258,6 +445,107 @@ class PaginatorTest(TestCase):
                 response_page = self.guest_client.get(key)
                 self.assertEqual(len(response_page.context["page_obj"]), value)
 
+    def create_posts(self, count):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f"Пост {number}", group=self.group)
+            for number in range(count)
+        )
+
+    def test_cursor_navigation(self):
+        """По курсорам after/before открываются соседние страницы"""
+        self.create_posts(18)
+        url = reverse("posts:group_list", kwargs={"slug": self.group.slug})
+        first_page = self.guest_client.get(url).context["page_obj"]
+        self.assertIsNone(first_page.previous_cursor)
+        second_page = self.guest_client.get(
+            url, {"after": first_page.next_cursor}
+        ).context["page_obj"]
+        self.assertEqual(second_page.number, 2)
+        self.assertEqual(len(second_page), 8)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertEqual(
+            list(second_page),
+            list(Post.objects.order_by("-pub_date", "-id")[10:])
+        )
+        back_page = self.guest_client.get(
+            url, {"before": second_page.previous_cursor}
+        ).context["page_obj"]
+        self.assertEqual(back_page.number, 1)
+        self.assertEqual(list(back_page), list(first_page))
+
+    def test_cursor_stable_on_new_posts(self):
+        """Новые посты не сдвигают следующую страницу"""
+        self.create_posts(18)
+        url = reverse("posts:profile", kwargs={"username": self.user})
+        first_page = self.guest_client.get(url).context["page_obj"]
+        expected = list(Post.objects.order_by("-pub_date", "-id")[10:])
+        self.create_posts(3)
+        second_page = self.guest_client.get(
+            url, {"after": first_page.next_cursor}
+        ).context["page_obj"]
+        self.assertEqual(list(second_page), expected)
+
+    def test_cursor_page_without_count(self):
+        """Страница по курсору не считает посты через COUNT(*)"""
+        self.create_posts(25)
+        url = reverse("posts:group_list", kwargs={"slug": self.group.slug})
+        page_obj = self.guest_client.get(url).context["page_obj"]
+        paginator = page_obj.paginator
+        with self.assertNumQueries(1):
+            page_obj = paginator.get_page(after=page_obj.next_cursor)
+        self.assertEqual(len(page_obj), 10)
+
+    def test_feed_queries_do_not_grow(self):
+        """Число запросов ленты не зависит от числа авторов на странице"""
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.guest_client.get(reverse("posts:index"))
+            return len(queries)
+
+        self.create_posts(1)
+        single = count_queries()
+        for number in range(9):
+            author = User.objects.create_user(username=f"author{number}")
+            Post.objects.create(author=author, text="Пост", group=self.group)
+        self.assertEqual(count_queries(), single)
+
+    def test_stale_count_past_end(self):
+        """Устаревший счётчик постов не ломает ссылку за концом ленты"""
+        self.create_posts(3)
+        AuthorStats.objects.update_or_create(
+            author=self.user, defaults={"posts_count": 50}
+        )
+        response = self.guest_client.get(
+            reverse("posts:profile", kwargs={"username": self.user}),
+            {"page": 99},
+        )
+        self.assertEqual(response.status_code, 200)
+        page_obj = response.context["page_obj"]
+        self.assertEqual(page_obj.number, 1)
+        self.assertEqual(len(page_obj), 3)
+
+    def test_overflowing_cursor(self):
+        """Курсор с числом вне диапазона int отдает первую страницу"""
+        self.create_posts(12)
+        raw = b'[1e400, "2020-01-01T00:00:00", 1]'
+        token = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+        response = self.guest_client.get(
+            reverse("posts:index"), {"after": token}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page_obj"].number, 1)
+
+    def test_broken_cursor(self):
+        """Битый курсор отдает первую страницу"""
+        self.create_posts(12)
+        response = self.guest_client.get(
+            reverse("posts:index"), {"after": "not-a-cursor"}
+        )
+        page_obj = response.context["page_obj"]
+        self.assertEqual(page_obj.number, 1)
+        self.assertEqual(len(page_obj), 10)
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class TaskPagesTests(TestCase):
@@ -396,3 +684,128 @@ class FollowViewsTest(TestCase):
         response = self.follower_client.get(reverse("posts:follow_index"))
         page_obj = response.context["page_obj"]
         self.assertEqual(len(page_obj), Follow.objects.count())
+
+    def test_timeline(self):
+        """Лента подписок заполняется при подписке и публикации"""
+        self.follower_client.get(
+            reverse(
+                "posts:profile_follow",
+                kwargs={"username": self.user.username}
+            )
+        )
+        self.assertEqual(
+            list(self.follower.timeline.values_list("post", flat=True)),
+            [self.post.pk]
+        )
+        new_post = Post.objects.create(author=self.user, text="Новый пост")
+        response = self.follower_client.get(reverse("posts:follow_index"))
+        self.assertEqual(
+            list(response.context["page_obj"]), [new_post, self.post]
+        )
+        self.follower_client.get(
+            reverse(
+                "posts:profile_unfollow",
+                kwargs={"username": self.user.username}
+            )
+        )
+        self.assertFalse(self.follower.timeline.exists())
+
+    @override_settings(FOLLOW_FEED_PULL_THRESHOLD=1)
+    def test_pulled_author(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        star = User.objects.create_user(username="star")
+        another = User.objects.create_user(username="another")
+        Follow.objects.create(user=self.follower, author=self.user)
+        Follow.objects.create(user=self.follower, author=star)
+        Follow.objects.create(user=another, author=star)
+        self.assertTrue(star.stats.pulled)
+        Post.objects.bulk_create(
+            Post(author=star, text=f"Пост звезды {number}")
+            for number in range(6)
+        )
+        for number in range(6):
+            Post.objects.create(author=self.user, text=f"Пост {number}")
+            Post.objects.create(author=star, text=f"Пост звезды {number}")
+        self.assertFalse(TimelineEntry.objects.filter(author=star).exists())
+        expected = list(
+            Post.objects.filter(author__in=[self.user, star])
+            .order_by("-pub_date", "-id")
+        )
+        url = reverse("posts:follow_index")
+        page_obj = self.follower_client.get(url).context["page_obj"]
+        self.assertEqual(list(page_obj), expected[:10])
+        page_obj = self.follower_client.get(
+            url, {"after": page_obj.next_cursor}
+        ).context["page_obj"]
+        self.assertEqual(list(page_obj), expected[10:])
+
+    def test_follow_page_cache(self):
+        """Первая страница ленты подписок кэшируется для каждого читателя"""
+        url = reverse("posts:follow_index")
+        stranger = User.objects.create_user(username="stranger")
+        Follow.objects.follow(self.follower, self.user)
+        self.follower_client.get(url)
+        with self.assertNumQueries(3):
+            response = self.follower_client.get(url)
+        self.assertIsNone(response.context)
+        generation = generations.current(f"follow:{self.follower.pk}")
+        Post.objects.create(author=stranger, text="Чужой пост")
+        self.assertEqual(
+            generations.current(f"follow:{self.follower.pk}"), generation
+        )
+        post = Post.objects.create(author=self.user, text="Свежий пост")
+        self.assertContains(self.follower_client.get(url), post.text)
+        post.text = "Исправленный пост"
+        post.save()
+        self.assertContains(self.follower_client.get(url), post.text)
+        Follow.objects.follow(self.follower, stranger)
+        self.assertContains(self.follower_client.get(url), "Чужой пост")
+        Follow.objects.unfollow(self.follower, stranger)
+        self.assertNotContains(self.follower_client.get(url), "Чужой пост")
+
+    @override_settings(FOLLOW_FEED_PULL_THRESHOLD=0)
+    def test_follow_page_cache_pulled_author(self):
+        """Пост «звезды» обновляет ленты читателей через её поколение"""
+        url = reverse("posts:follow_index")
+        Follow.objects.follow(self.follower, self.user)
+        self.follower_client.get(url)
+        generation = generations.current(f"follow:{self.follower.pk}")
+        post = Post.objects.create(author=self.user, text="Пост звезды")
+        self.assertEqual(
+            generations.current(f"follow:{self.follower.pk}"), generation
+        )
+        self.assertContains(self.follower_client.get(url), post.text)
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка и отписка ничего не ломают"""
+        self.assertTrue(Follow.objects.follow(self.follower, self.user))
+        self.assertFalse(Follow.objects.follow(self.follower, self.user))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(self.user.stats.followers_count, 1)
+        self.assertTrue(Follow.objects.unfollow(self.follower, self.user))
+        self.assertFalse(Follow.objects.unfollow(self.follower, self.user))
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(self.follower.timeline.exists())
+
+    def test_followed_ids(self):
+        """Подписки на несколько авторов проверяются одним запросом"""
+        authors = [
+            User.objects.create_user(username=f"author{number}")
+            for number in range(3)
+        ]
+        Follow.objects.follow(self.follower, authors[0])
+        Follow.objects.follow(self.follower, authors[2])
+        with self.assertNumQueries(1):
+            followed = Follow.objects.followed_ids(
+                self.follower, authors + [self.user]
+            )
+        self.assertEqual(followed, {authors[0].pk, authors[2].pk})
+
+    def test_profile_following_is_per_viewer(self):
+        """Кнопка «Отписаться» только у подписанного читателя"""
+        Follow.objects.follow(self.follower, self.user)
+        url = reverse("posts:profile", kwargs={"username": self.user})
+        self.assertTrue(
+            self.follower_client.get(url).context["following"]
+        )
+        self.assertFalse(self.user_client.get(url).context["following"])
@@ -0,0 +1,268 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import images
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Все миниатюры постов, которые показывают шаблоны: они готовятся в фоне
+# сразу после сохранения картинки, а шаблоны берут их по имени.
+THUMBNAILS = {
+    "card": ("960x339", {"upscale": True}),
+    "detail": ("960x339", {"crop": "center", "upscale": True}),
+}
+# Каждая миниатюра готовится в нескольких ширинах для srcset: в WebP,
+# если Pillow его умеет, и в JPEG для остальных браузеров.
+WIDTHS = (320, 640, 960)
+FORMATS = ("WEBP", "JPEG") if features.check("webp") else ("JPEG",)
+SIZES = "(max-width: 960px) 100vw, 960px"
+
+
+def variants(name):
+    """Варианты миниатюры ``THUMBNAILS[name]``: ``(формат, геометрия,
+    параметры sorl)``, от узких к широким."""
+    geometry, options = THUMBNAILS[name]
+    width, height = (int(side) for side in geometry.split("x"))
+    return [
+        (
+            image_format,
+            f"{size}x{round(height * size / width)}",
+            {**options, "format": image_format},
+        )
+        for image_format in FORMATS
+        for size in WIDTHS
+        if size <= width
+    ]
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """Бэкенд sorl-thumbnail, умеющий отдать только готовые миниатюры."""
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с именем, как в ``get_thumbnail``; оригинал не
+        открывается и ничего не создаётся."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault("format", self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnails(self, requests):
+        """Готовые миниатюры для ``(файл, геометрия, параметры)`` из
+        хранилища ключей sorl, ``None`` для ещё не созданных. Хранилище
+        с ``get_many`` (как ``posts.kvstore.KVStore``) отвечает одним
+        запросом."""
+        thumbnails = [
+            self.get_thumbnail_file(file_, geometry_string, **options)
+            for file_, geometry_string, options in requests
+        ]
+        if hasattr(default.kvstore, "get_many"):
+            return default.kvstore.get_many(thumbnails)
+        return [default.kvstore.get(thumbnail) for thumbnail in thumbnails]
+
+
+def prefetch_thumbnails(posts, name):
+    """Находит готовые варианты миниатюры ``THUMBNAILS[name]`` всех
+    постов разом.
+
+    Результат запоминается в посте, и ``ready_variants`` потом не
+    обращается к хранилищу.
+    """
+    pairs = [
+        (post, variant)
+        for post in posts if post.image
+        for variant in variants(name)
+    ]
+    found = default.backend.get_ready_thumbnails([
+        (post.image, geometry, options)
+        for post, (_, geometry, options) in pairs
+    ])
+    for post in posts:
+        post.__dict__.setdefault("ready_thumbnails", {})[name] = []
+    for (post, (image_format, _, _)), thumbnail in zip(pairs, found):
+        if thumbnail is not None:
+            post.ready_thumbnails[name].append((image_format, thumbnail))
+
+
+def ready_variants(post, name):
+    """Готовые варианты миниатюры картинки поста: ``(формат, файл)``."""
+    if not post.image:
+        return []
+    prefetched = getattr(post, "ready_thumbnails", {})
+    if name not in prefetched:
+        prefetch_thumbnails([post], name)
+    return post.ready_thumbnails[name]
+
+
+def picture(post, name):
+    """Всё для ``<picture>`` картинки поста: ``srcset`` по форматам,
+    ``src`` и размеры самого широкого JPEG. Пока JPEG не готов,
+    ``src`` — оригинал с размерами из модели. ``placeholder`` — заглушка,
+    которую видно, пока картинка грузится."""
+    srcsets = {}
+    for image_format, thumbnail in ready_variants(post, name):
+        srcsets.setdefault(image_format, []).append(thumbnail)
+    jpeg = srcsets.pop("JPEG", None)
+    if not jpeg:
+        return {
+            "src": post.image.url if post.image else None,
+            "width": post.image_width,
+            "height": post.image_height,
+            "placeholder": post.image_placeholder,
+        }
+    return {
+        "sources": [
+            (f"image/{image_format.lower()}", srcset(thumbnails))
+            for image_format, thumbnails in srcsets.items()
+        ],
+        "srcset": srcset(jpeg),
+        "sizes": SIZES,
+        "src": jpeg[-1].url,
+        "width": jpeg[-1].width,
+        "height": jpeg[-1].height,
+        "placeholder": post.image_placeholder,
+    }
+
+
+def srcset(thumbnails):
+    return ", ".join(
+        f"{thumbnail.url} {thumbnail.width}w" for thumbnail in thumbnails
+    )
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Пул потоков процесса; после fork создаётся заново."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix="thumbnails",
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def schedule(post):
+    """Готовит миниатюры поста в фоне после фиксации транзакции."""
+    if post.image:
+        transaction.on_commit(
+            lambda: executor().submit(_pregenerate_in_background, post.pk)
+        )
+
+
+def drain():
+    """Дожидается всех поставленных заданий.
+
+    Следующее задание создаст новый пул. Нужно тестам, которые удаляют
+    MEDIA_ROOT.
+    """
+    global _executor
+    with _executor_lock:
+        pool, _executor = _executor, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def pregenerate(post_id, bump=True):
+    """Создаёт все миниатюры и заглушку картинки поста и обновляет его
+    карточки в лентах; ``True``, если чего-то не хватало.
+
+    Пока миниатюр нет, шаблоны показывают оригинал. Сохранение поста
+    меняет ``updated`` и сдвигает поколения его лент, так что карточки
+    перерисовываются уже с миниатюрой. С ``bump=False`` пост
+    обновляется без сигналов, и поколения лент сдвигает вызывающий.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return False
+    update_fields = ["updated"]
+    if not post.image_placeholder:
+        post.image_placeholder = images.placeholder(post.image)
+        update_fields.append("image_placeholder")
+    # Одинаковые картинки хранятся одним файлом, и их миниатюры уже могут
+    # быть готовы: тогда лентам нечего обновлять, если заглушка уже есть.
+    requests = [
+        (post.image, geometry, options)
+        for name in THUMBNAILS
+        for _, geometry, options in variants(name)
+    ]
+    found = default.backend.get_ready_thumbnails(requests)
+    pending = [
+        (geometry, options)
+        for (_, geometry, options), thumbnail in zip(requests, found)
+        if thumbnail is None
+    ]
+    if not pending and "image_placeholder" not in update_fields:
+        return False
+    for geometry, options in pending:
+        get_thumbnail(post.image, geometry, **options)
+    if bump:
+        post.save(update_fields=update_fields)
+    else:
+        post.updated = timezone.now()
+        Post.objects.filter(pk=post.pk).update(
+            **{field: getattr(post, field) for field in update_fields}
+        )
+    return True
+
+
+def prune_stale(image):
+    """Удаляет миниатюры картинки, которых нет среди ``THUMBNAILS``:
+    они остаются после смены геометрии, ширин или форматов. Возвращает
+    число удалённых."""
+    source = ImageFile(image)
+    keys = default.kvstore._get(source.key, identity="thumbnails") or []
+    configured = {
+        default.backend.get_thumbnail_file(image, geometry, **options).key
+        for name in THUMBNAILS
+        for _, geometry, options in variants(name)
+    }
+    stale = [key for key in keys if key not in configured]
+    if not stale:
+        return 0
+    for key in stale:
+        thumbnail = default.kvstore._get(key)
+        if thumbnail is not None:
+            default.kvstore.delete(thumbnail, delete_thumbnails=False)
+            thumbnail.delete()
+    kept = [key for key in keys if key in configured]
+    if kept:
+        default.kvstore._set(source.key, kept, identity="thumbnails")
+    else:
+        default.kvstore._delete(source.key, identity="thumbnails")
+    return len(stale)
+
+
+def _pregenerate_in_background(post_id):
+    try:
+        pregenerate(post_id)
+    except Exception:
+        logger.exception("Миниатюры поста %s не созданы", post_id)
+    finally:
+        # Соединения с базой, открытые потоком пула, сами не закроются.
+        connections.close_all()
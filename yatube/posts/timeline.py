@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.db.models import F
+
+from .models import AuthorStats, Follow, Post, PostQuerySet, TimelineEntry
+from .paginators import paginate
+
+BATCH_SIZE = 1000
+
+
+def is_pulled(author_id):
+    return AuthorStats.objects.filter(
+        author_id=author_id, pulled=True
+    ).exists()
+
+
+def change_followers(author_id, delta):
+    """Сдвигает счётчик подписчиков автора.
+
+    Когда подписчиков становится больше
+    ``FOLLOW_FEED_PULL_THRESHOLD``, автор навсегда переводится на
+    чтение при показе ленты: обратный перевод потребовал бы разложить
+    все его посты по лентам подписчиков.
+    """
+    if delta > 0:
+        AuthorStats.objects.get_or_create(author_id=author_id)
+    stats = AuthorStats.objects.filter(author_id=author_id)
+    if delta < 0:
+        stats = stats.filter(followers_count__gte=-delta)
+    stats.update(followers_count=F("followers_count") + delta)
+    stats.filter(
+        followers_count__gt=settings.FOLLOW_FEED_PULL_THRESHOLD, pulled=False
+    ).update(pulled=True)
+
+
+def followers_of(author_id):
+    """id подписчиков автора; ``None``, если его посты не раскладываются."""
+    if is_pulled(author_id):
+        return None
+    return list(Follow.objects.filter(
+        author_id=author_id
+    ).values_list("user_id", flat=True))
+
+
+def follow_scopes(author_id, followers):
+    """Поколения лент подписок, которые устаревают от постов автора.
+
+    Ленты подписчиков находятся по обратному индексу «автор →
+    подписчики». У «звёзд» подписчиков слишком много, поэтому
+    сдвигается одно поколение автора, а лента читателя проверяет
+    поколения всех «звёзд», на которых он подписан.
+    """
+    if followers is None:
+        return {f"pulled:{author_id}"}
+    return {f"follow:{user_id}" for user_id in followers}
+
+
+def pulled_authors(request):
+    """id «звёзд», на которых подписан читатель; запоминается в запросе."""
+    if not hasattr(request, "pulled_authors"):
+        request.pulled_authors = list(Follow.objects.filter(
+            user=request.user, author__stats__pulled=True
+        ).values_list("author_id", flat=True))
+    return request.pulled_authors
+
+
+def reader_scopes(request, **kwargs):
+    """Поколения, от которых зависит лента подписок читателя."""
+    return [f"follow:{request.user.pk}"] + [
+        f"pulled:{author_id}" for author_id in pulled_authors(request)
+    ]
+
+
+def push_post(post, followers):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя все посты автора после подписки."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        "pk", "pub_date"
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты читателя после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def follow_page(request):
+    """Страница ленты подписок: своя лента, слитая с лентами «звёзд»."""
+    page_obj = paginate(
+        request,
+        request.user.timeline.select_related(
+            "post__author", "post__group"
+        ).only(
+            "user",
+            "pub_date",
+            *(f"post__{field}" for field in PostQuerySet.FEED_FIELDS),
+        ),
+        ordering=("pub_date", "post_id"),
+        merge=[
+            (
+                Post.objects.for_feed().filter(author_id=author_id),
+                ("pub_date", "id"),
+            )
+            for author_id in pulled_authors(request)
+        ],
+    )
+    page_obj.object_list = [
+        row.post if isinstance(row, TimelineEntry) else row
+        for row in page_obj
+    ]
+    return page_obj
@@ -35,6 +35,11 @@ urlpatterns = [
         views.post_edit,
         name="post_edit"
     ),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments"
+    ),
     path(
         "posts/<int:post_id>/comment/",
         views.add_comment,
@@ -1,62 +1,91 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
-from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db.models import Max
 
+from . import generations, lookups, thumbnails, timeline
+from .conditional import conditional
+from .generations import cache_feed
 from .forms import PostForm, CommentForm
-from .models import Post, Group, Follow
+from .models import AuthorStats, Follow, Post
+from .paginators import COMMENTS_PER_PAGE, paginate
 
 
-User = get_user_model()
-
-
-@cache_page(20)
+@cache_feed("index")
 def index(request):
-    posts = Post.objects.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.for_feed()
+    page_obj = paginate(request, posts)
     context = {
         "page_obj": page_obj,
+        "generation": request.feed_generation,
     }
     return render(request, "posts/index.html", context)
 
 
+@cache_feed("group:{slug}")
 def group_posts(request, slug):
-    group = get_object_or_404(
-        Group.objects.prefetch_related("posts"), slug=slug
-    )
-    posts = group.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    group = lookups.groups.get_or_404(slug)
+    posts = group.posts.for_feed()
+    page_obj = paginate(request, posts)
     context = {
         "group": group,
         "page_obj": page_obj,
+        "generation": request.feed_generation,
     }
     return render(request, "posts/group_list.html", context)
 
 
+@cache_feed("author:{username}")
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-    following = author.following.exists()
+    author = lookups.users.get_or_404(username)
+    posts = author.posts.for_feed()
+    stats = AuthorStats.objects.for_author(author)
+    page_obj = paginate(request, posts, count=stats.posts_count)
+    following = author.pk in Follow.objects.followed_ids(
+        request.user, [author]
+    )
     context = {
         "author": author,
         "page_obj": page_obj,
         "following": following,
+        "generation": request.feed_generation,
     }
     return render(request, "posts/profile.html", context)
 
 
+def post_state(request, post_id):
+    """Всё, от чего зависит страница поста, одним запросом."""
+    state = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Max("comments__created")
+    ).values_list(
+        "updated",
+        "last_comment",
+        "author__username",
+        "author__first_name",
+        "author__last_name",
+        "author__stats__posts_count",
+        "group__slug",
+        "group__title",
+    ).first()
+    if state is None:
+        return None
+    updated, last_comment = state[:2]
+    parts = state + (generations.current(f"post:{post_id}"),)
+    return parts, max(updated, last_comment or updated)
+
+
+@conditional(post_state)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    post_count = post.author.posts.count()
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
+    try:
+        post_count = post.author.stats.posts_count
+    except AuthorStats.DoesNotExist:
+        post_count = 0
+    comments = paginate(
+        request,
+        post.comments.for_list(),
+        per_page=COMMENTS_PER_PAGE,
+        ordering=("created", "id"),
+    )
     form = CommentForm(request.POST or None)
     context = {
         "post_count": post_count,
@@ -67,6 +96,23 @@ def post_detail(request, post_id):
     return render(request, "posts/post_detail.html", context)
 
 
+@cache_feed("post:{post_id}")
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only("pk"), id=post_id)
+    comments = paginate(
+        request,
+        post.comments.for_list(),
+        per_page=COMMENTS_PER_PAGE,
+        ordering=("created", "id"),
+    )
+    context = {
+        "post": post,
+        "comments": comments,
+    }
+    return render(request, "includes/comments_list.html", context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -77,13 +123,14 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect("posts:profile", post.author)
     return render(request, "posts/create_post.html", {"form": form})
 
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
     if post.author != request.user:
         return redirect("posts:post_detail", post_id)
     form = PostForm(
@@ -92,7 +139,9 @@ def post_edit(request, post_id):
         files=request.FILES or None
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if "image" in form.changed_data:
+            thumbnails.schedule(post)
         return redirect("posts:post_detail", post_id)
     context = {
         "form": form,
@@ -115,32 +164,25 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache_feed(timeline.reader_scopes, first_page_only=True, guests=False)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
     context = {
-        "page_obj": page_obj,
+        "page_obj": timeline.follow_page(request),
+        "generation": request.feed_generation,
     }
     return render(request, "posts/follow.html", context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if author != request.user and not Follow.objects.filter(
-        user=request.user, author=author
-    ).exists():
-        Follow.objects.create(user=request.user, author=author)
+    author = lookups.users.get_or_404(username)
+    if author != request.user:
+        Follow.objects.follow(request.user, author)
     return redirect("posts:follow_index")
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    if Follow.objects.filter(
-        user=request.user, author=author
-    ).exists():
-        Follow.objects.get(user=request.user, author=author).delete()
+    author = lookups.users.get_or_404(username)
+    Follow.objects.unfollow(request.user, author)
     return redirect("posts:follow_index")
@@ -38,23 +38,35 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Готовые страницы для гостей: до сессий, авторизации и CSRF.
+    "core.middleware.AnonymousCacheMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = "yatube.urls"
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+if not DEBUG:
+    # Шаблоны компилируются один раз на процесс; при запуске воркера
+    # их заранее прогревает core.warmup.
+    TEMPLATE_LOADERS = [
+        ("django.template.loaders.cached.Loader", TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [TEMPLATES_DIR],
-        "APP_DIRS": True,
         "OPTIONS": {
+            "loaders": TEMPLATE_LOADERS,
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -130,9 +142,54 @@ CSRF_FAILURE_VIEW = "core.views.csrf_failure"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+TEST_RUNNER = "core.testing.TestRunner"
 
+
+# Один файл кэша на хост: его разделяют все воркеры приложения. Тесты
+# работают со своими кэшем и индексом миниатюр (core.testing).
+# Обёртка считает попадания, промахи и задержки по пространствам имён
+# ключей: /admin/cache-stats/ и ``manage.py cache_stats``.
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "BACKEND": "core.cache_stats.InstrumentedCache",
+        "OPTIONS": {
+            "WRAPPED": {
+                "BACKEND": "core.cache.SQLiteCache",
+                "LOCATION": os.environ.get(
+                    "YATUBE_CACHE_PATH", os.path.join(BASE_DIR, "cache.sqlite3")
+                ),
+                "OPTIONS": {"MAX_ENTRIES": 10000},
+            },
+            "NAMESPACES": [
+                "views.decorators.cache.*",
+                "template.cache.*",
+                "view.posts.views.*",
+                "generation:*",
+            ],
+        },
     }
 }
+
+# Загрузки сразу пишутся во временный файл, а не держатся в памяти.
+FILE_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+# Картинки постов уменьшаются при загрузке до этого размера большей
+# стороны; больше стольких пикселей после уменьшенного декодирования
+# картинка не принимается.
+POST_IMAGE_MAX_SIDE = 1920
+POST_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+# Не JPEG декодируются целиком, без уменьшения при чтении.
+POST_IMAGE_MAX_FULL_PIXELS = 12 * 10 ** 6
+
+# Миниатюры картинок постов готовит пул потоков сразу после загрузки.
+THUMBNAIL_BACKEND = "posts.thumbnails.ThumbnailBackend"
+THUMBNAIL_WORKERS = 2
+# Индекс готовых миниатюр sorl — файл SQLite рядом с MEDIA_ROOT, но не в
+# раздаваемом каталоге (или по пути THUMBNAIL_KVSTORE_PATH), а не кэш
+# с таблицей в базе.
+THUMBNAIL_KVSTORE = "posts.kvstore.KVStore"
+
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписчиков при публикации, а подмешиваются при чтении ленты.
+FOLLOW_FEED_PULL_THRESHOLD = 10000
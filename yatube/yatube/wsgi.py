@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
 
 application = get_wsgi_application()
+
+# Первый запрос воркера не должен платить за компиляцию шаблонов и URL.
+from core.warmup import warm_up  # noqa: E402
+
+warm_up()